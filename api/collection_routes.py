@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import date
 from sqlalchemy.orm import Session
 from database import get_db
 from services.collection_service import CollectionService
@@ -13,24 +15,57 @@ class PaymentRequest(BaseModel):
     paid_by: str = "System"
     loan_advance: float = 0
     credit_officer: str = ""
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+
+class PaymentBatchRequest(BaseModel):
+    payments: list[PaymentRequest] = Field(..., min_length=1, max_length=500)
 
 
 @router.get("/list")
 def get_collection_list(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    after: str = Query(None),
     db: Session = Depends(get_db)
 ):
     """
-    Get collection list with approved loans only.
+    Get collection list with approved loans only, newest first.
     Combines loans, loan_members, and loan_member_emi data.
-    Returns list of collections with all member and EMI details.
+    Returns list of collections with all member and EMI details, and the cursor of the next page
+    to pass as after (null on the last page).
     """
-    collections = CollectionService.get_collection_list(db, skip, limit)
+    try:
+        collections, next_cursor = CollectionService.get_collection_list(db, skip, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "success": True,
         "data": collections,
-        "count": len(collections)
+        "count": len(collections),
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/due")
+def get_due_collections(
+    staff_id: str = Query(..., min_length=1),
+    due_date: date = Query(None, alias="date"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the day's route sheet for a staff member.
+    Returns the unpaid EMIs due on the date (default today) or overdue, for loans assigned to the staff member.
+    Overdue EMIs from every earlier date are included, flagged with "overdue": true.
+    """
+    due_date = due_date or date.today()
+    collections = CollectionService.get_due_collections(db, staff_id, due_date)
+    return {
+        "success": True,
+        "date": due_date.isoformat(),
+        "data": collections,
+        "count": len(collections),
+        "totalAmount": round(sum(row["amount"] for row in collections), 2)
     }
 
 
@@ -56,9 +91,14 @@ def get_collection_details(
 @router.post("/payment/process")
 def process_emi_payment(
     payment: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db)
 ):
-    """Process EMI payment and update status"""
+    """
+    Process EMI payment and update status.
+    Send an Idempotency-Key header (or idempotency_key) to make retries safe: a retry with the same key
+    returns the original result without applying the payment again.
+    """
     try:
         result = CollectionService.process_emi_payment(
             db,
@@ -67,6 +107,7 @@ def process_emi_payment(
             payment.paid_by,
             loan_advance=payment.loan_advance,
             credit_officer=payment.credit_officer,
+            idempotency_key=idempotency_key or payment.idempotency_key,
         )
         if result:
             return {
@@ -86,3 +127,26 @@ def process_emi_payment(
             "message": str(e),
             "data": {}
         }
+
+
+@router.post("/payment/process-batch")
+def process_emi_payments(
+    batch: PaymentBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Process a batch of EMI payments in one transaction, e.g. when syncing an offline group meeting.
+    Returns one result per payment, in the order submitted. A payment for an EMI that another
+    payment changed first fails on its own with a retry message, as does a second payment for the same
+    EMI in one batch; the rest of the batch is committed.
+    """
+    results = CollectionService.process_emi_payments(
+        db,
+        [payment.model_dump() for payment in batch.payments],
+    )
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "success": succeeded == len(results),
+        "message": f"Processed {succeeded} of {len(results)} payments",
+        "data": results
+    }
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas.loan import LoanCreate, LoanUpdate, LoanResponse
@@ -24,9 +24,23 @@ def get_loan(loan_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[LoanResponse])
-def get_loans(skip: int = Query(0), limit: int = Query(100), db: Session = Depends(get_db)):
-    """Get all active loans"""
-    loans = LoanService.get_loans(db, skip, limit)
+def get_loans(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    after: str = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all active loans, newest first.
+    Page with the after cursor; the cursor of the next page is in the X-Next-Cursor header.
+    """
+    try:
+        loans, next_cursor = LoanService.get_loans(db, skip, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return loans
 
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas.member_group import MemberGroupCreate, MemberGroupUpdate, MemberGroupResponse
@@ -18,10 +18,21 @@ def create_group(group: MemberGroupCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[MemberGroupResponse])
-def get_groups(skip: int = Query(0), limit: int = Query(100), db: Session = Depends(get_db)):
-    """Get all active member groups"""
+def get_groups(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    after: str = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all active member groups, newest first.
+    Page with the after cursor; the cursor of the next page is in the X-Next-Cursor header.
+    """
     try:
-        groups = MemberGroupService.get_groups(db, skip, limit)
+        groups, next_cursor = MemberGroupService.get_groups(db, skip, limit, after)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return groups
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -78,8 +89,8 @@ def reactivate_group(
 @router.get("/search/query", response_model=list[MemberGroupResponse])
 def search_groups(
     q: str = Query(...),
-    skip: int = Query(0),
-    limit: int = Query(100),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """Search member groups by name or place"""
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas.member import MemberCreate, MemberUpdate, MemberResponse
@@ -38,12 +38,22 @@ def get_member(member_id: int, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=list[MemberResponse])
 def get_members(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    after: str = Query(None),
     db: Session = Depends(get_db)
 ):
-    """Get all active members with pagination"""
-    members = MemberService.get_members(db, skip=skip, limit=limit)
+    """
+    Get all active members with pagination, newest first.
+    Page with the after cursor; the cursor of the next page is in the X-Next-Cursor header.
+    """
+    try:
+        members, next_cursor = MemberService.get_members(db, skip=skip, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return members
 
 
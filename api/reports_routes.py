@@ -1,21 +1,87 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
-from services.reports_service import ReportsService
-from services.export_service import ExportService
+from database import get_db, SessionLocal
+from services.reports_service import ReportsService, REPORT_SECTIONS, PAGED_SECTIONS, SECTION_SORT_KEYS
+from services.export_service import ExportService, EXPORT_REPORTS, SPREADSHEET_SECTIONS, SPREADSHEET_FORMATS
+from services.report_cache import report_cache
+from services.export_cache import export_cache
+from services.export_job_service import export_jobs, JOB_COMPLETED
+from schemas.export_job_schema import ExportJobCreate
 from datetime import date
 from typing import List, Optional
 import io
-import os
+import json
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+EXPORT_CHUNK_SIZE = 64 * 1024
+SPREADSHEET_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _iter_spool(spool):
+    """Yield an export file in chunks and close it once sent"""
+    try:
+        for chunk in iter(lambda: spool.read(EXPORT_CHUNK_SIZE), b""):
+            yield chunk
+    finally:
+        spool.close()
+
+
+def _docx_response(f, filename: str):
+    """Stream a Word document from a file owned by this request, closing it once sent"""
+    size = f.seek(0, io.SEEK_END)
+    f.seek(0)
+    return StreamingResponse(
+        _iter_spool(f),
+        media_type=DOCX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(size),
+        },
+    )
+
 
 @router.get("/filter-options")
-def get_filter_options(db: Session = Depends(get_db)):
-    """Get all available filter options for reports"""
-    return ReportsService.get_filter_options(db)
+def get_filter_options(
+    response: Response,
+    db: Session = Depends(get_db),
+    member_prefix: Optional[str] = Query(None),
+    loan_prefix: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get all available filter options for reports.
+    member_prefix and loan_prefix narrow the member and loan lists, limit caps them.
+    Responds 304 when If-None-Match carries the current ETag.
+    """
+    options, etag = ReportsService.get_cached_filter_options(
+        db,
+        member_prefix=member_prefix,
+        loan_prefix=loan_prefix,
+        limit=limit,
+    )
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if if_none_match:
+        client_etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return options
+
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    """Get hit/miss counters of the report data cache and the export artifact cache"""
+    return {**report_cache.stats(), "exports": export_cache.stats()}
 
 
 @router.get("/data")
@@ -28,8 +94,23 @@ def get_reports_data(
     group_ids: Optional[List[int]] = Query(None),
     staff_ids: Optional[List[str]] = Query(None),
     loan_ids: Optional[List[int]] = Query(None),
+    sections: Optional[List[str]] = Query(None),
+    include_details: bool = Query(False),
+    parallel: bool = Query(False),
 ):
-    """Get reports data with filters applied"""
+    """
+    Get reports data with filters applied.
+    sections limits the response to the given sections (metrics, summary, user, emi, collections).
+    include_details adds the nested emiDetails and userDetails arrays.
+    parallel computes the sections concurrently and reports their timings under metadata.
+    """
+    invalid_sections = [name for name in sections or [] if name not in REPORT_SECTIONS]
+    if invalid_sections:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sections: {', '.join(invalid_sections)}. Use {', '.join(REPORT_SECTIONS)}"
+        )
+
     return ReportsService.get_reports_data(
         db,
         start_date=start_date,
@@ -39,11 +120,61 @@ def get_reports_data(
         group_ids=group_ids,
         staff_ids=staff_ids,
         loan_ids=loan_ids,
+        sections=sections,
+        include_details=include_details,
+        parallel=parallel,
     )
 
 
-@router.get("/export/financial-summary")
-def export_financial_summary(
+@router.get("/data/stream")
+def stream_reports_data(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    emi_days: Optional[List[str]] = Query(None),
+    member_ids: Optional[List[int]] = Query(None),
+    group_ids: Optional[List[int]] = Query(None),
+    staff_ids: Optional[List[str]] = Query(None),
+    loan_ids: Optional[List[int]] = Query(None),
+    sections: Optional[List[str]] = Query(None),
+    include_details: bool = Query(False),
+):
+    """
+    Stream reports data as NDJSON, one {"section": ..., "data": ...} line per metrics block or row,
+    ending with {"section": "end", "loans_count": ...}.
+    """
+    invalid_sections = [name for name in sections or [] if name not in REPORT_SECTIONS]
+    if invalid_sections:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sections: {', '.join(invalid_sections)}. Use {', '.join(REPORT_SECTIONS)}"
+        )
+
+    def generate():
+        # The response outlives the request dependencies, so the stream owns its session
+        db = SessionLocal()
+        try:
+            for item in ReportsService.iter_reports_data(
+                db,
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+                sections=sections,
+                include_details=include_details,
+            ):
+                yield json.dumps(item, default=str) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/sections/{section}")
+def get_report_section_page(
+    section: str,
     db: Session = Depends(get_db),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
@@ -52,11 +183,28 @@ def export_financial_summary(
     group_ids: Optional[List[int]] = Query(None),
     staff_ids: Optional[List[str]] = Query(None),
     loan_ids: Optional[List[int]] = Query(None),
+    sort_by: str = Query("loanId"),
+    sort_order: str = Query("asc"),
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[str] = Query(None),
+    include_details: bool = Query(False),
 ):
-    """Export Financial Summary to Word document"""
+    """
+    Get one page of the summary, user or collections report section.
+    Pass next_cursor from the previous page as after to get the next page.
+    Totals for the whole filtered set are returned with the first page.
+    """
+    if section not in PAGED_SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Invalid section. Use {', '.join(PAGED_SECTIONS)}")
+    if sort_by not in SECTION_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort_by. Use {', '.join(SECTION_SORT_KEYS)}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid sort_order. Use 'asc' or 'desc'")
+
     try:
-        data = ReportsService.get_reports_data(
+        return ReportsService.get_section_page(
             db,
+            section,
             start_date=start_date,
             end_date=end_date,
             emi_days=emi_days,
@@ -64,19 +212,44 @@ def export_financial_summary(
             group_ids=group_ids,
             staff_ids=staff_ids,
             loan_ids=loan_ids,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            limit=limit,
+            after=after,
+            include_details=include_details,
         )
-        
-        doc = ExportService.export_financial_summary(data['summary_data'], data['metrics'])
-        
-        # Save to temporary file
-        temp_file = f"/tmp/financial_summary_{date.today()}.docx"
-        doc.save(temp_file)
-        
-        return FileResponse(
-            path=temp_file,
-            filename=f"Financial_Summary_{date.today()}.docx",
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/financial-summary")
+def export_financial_summary(
+    db: Session = Depends(get_db),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    emi_days: Optional[List[str]] = Query(None),
+    member_ids: Optional[List[int]] = Query(None),
+    group_ids: Optional[List[int]] = Query(None),
+    staff_ids: Optional[List[str]] = Query(None),
+    loan_ids: Optional[List[int]] = Query(None),
+):
+    """Export Financial Summary to Word document"""
+    try:
+        f = ExportService.render_report(
+            db,
+            "financial-summary",
+            dict(
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            ),
         )
+
+        return _docx_response(f, f"Financial_Summary_{date.today()}.docx")
     except Exception as e:
         return {"error": str(e)}
 
@@ -94,28 +267,21 @@ def export_user_summary(
 ):
     """Export User Summary to Word document"""
     try:
-        data = ReportsService.get_reports_data(
+        f = ExportService.render_report(
             db,
-            start_date=start_date,
-            end_date=end_date,
-            emi_days=emi_days,
-            member_ids=member_ids,
-            group_ids=group_ids,
-            staff_ids=staff_ids,
-            loan_ids=loan_ids,
-        )
-        
-        doc = ExportService.export_user_summary(data['user_summary_data'])
-        
-        # Save to temporary file
-        temp_file = f"/tmp/user_summary_{date.today()}.docx"
-        doc.save(temp_file)
-        
-        return FileResponse(
-            path=temp_file,
-            filename=f"User_Summary_{date.today()}.docx",
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            "user-summary",
+            dict(
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            ),
         )
+
+        return _docx_response(f, f"User_Summary_{date.today()}.docx")
     except Exception as e:
         return {"error": str(e)}
 
@@ -133,28 +299,21 @@ def export_emi_summary(
 ):
     """Export EMI Summary to Word document"""
     try:
-        data = ReportsService.get_reports_data(
+        f = ExportService.render_report(
             db,
-            start_date=start_date,
-            end_date=end_date,
-            emi_days=emi_days,
-            member_ids=member_ids,
-            group_ids=group_ids,
-            staff_ids=staff_ids,
-            loan_ids=loan_ids,
-        )
-        
-        doc = ExportService.export_emi_summary(data['emi_summary_data'])
-        
-        # Save to temporary file
-        temp_file = f"/tmp/emi_summary_{date.today()}.docx"
-        doc.save(temp_file)
-        
-        return FileResponse(
-            path=temp_file,
-            filename=f"EMI_Summary_{date.today()}.docx",
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            "emi-summary",
+            dict(
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            ),
         )
+
+        return _docx_response(f, f"EMI_Summary_{date.today()}.docx")
     except Exception as e:
         return {"error": str(e)}
 
@@ -172,27 +331,194 @@ def export_collections_summary(
 ):
     """Export Collections Summary to Word document"""
     try:
-        data = ReportsService.get_reports_data(
+        f = ExportService.render_report(
             db,
-            start_date=start_date,
-            end_date=end_date,
-            emi_days=emi_days,
-            member_ids=member_ids,
-            group_ids=group_ids,
-            staff_ids=staff_ids,
-            loan_ids=loan_ids,
-        )
-        
-        doc = ExportService.export_collections_summary(data['collections_summary_data'])
-        
-        # Save to temporary file
-        temp_file = f"/tmp/collections_summary_{date.today()}.docx"
-        doc.save(temp_file)
-        
-        return FileResponse(
-            path=temp_file,
-            filename=f"Collections_Summary_{date.today()}.docx",
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            "collections-summary",
+            dict(
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            ),
         )
+
+        return _docx_response(f, f"Collections_Summary_{date.today()}.docx")
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/export/bundle")
+def export_bundle(
+    db: Session = Depends(get_db),
+    reports: Optional[List[str]] = Query(None),
+    sections: Optional[List[str]] = Query(None),
+    formats: Optional[List[str]] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    emi_days: Optional[List[str]] = Query(None),
+    member_ids: Optional[List[int]] = Query(None),
+    group_ids: Optional[List[int]] = Query(None),
+    staff_ids: Optional[List[str]] = Query(None),
+    loan_ids: Optional[List[int]] = Query(None),
+):
+    """
+    Export several reports for the same filters as one ZIP, computing the report data once.
+    reports are the Word exports (financial-summary, user-summary, emi-summary, collections-summary);
+    sections (metrics, summary, user, emi, collections) are added as spreadsheets in each of formats
+    (csv, xlsx; csv by default). With neither reports nor sections, all four Word exports are included.
+    """
+    if not reports and not sections:
+        reports = list(EXPORT_REPORTS)
+    reports = list(dict.fromkeys(reports or []))
+    sections = list(dict.fromkeys(sections or []))
+    formats = list(dict.fromkeys(formats or ["csv"]))
+
+    invalid_reports = [name for name in reports if name not in EXPORT_REPORTS]
+    if invalid_reports:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid reports: {', '.join(invalid_reports)}. Use {', '.join(EXPORT_REPORTS)}"
+        )
+    invalid_sections = [name for name in sections if name not in SPREADSHEET_SECTIONS]
+    if invalid_sections:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sections: {', '.join(invalid_sections)}. Use {', '.join(SPREADSHEET_SECTIONS)}"
+        )
+    invalid_formats = [name for name in formats if name not in SPREADSHEET_FORMATS]
+    if invalid_formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid formats: {', '.join(invalid_formats)}. Use {', '.join(SPREADSHEET_FORMATS)}"
+        )
+
+    # One query pass for every file in the bundle
+    needed_sections = set(sections)
+    for report_type in reports:
+        needed_sections.update(EXPORT_REPORTS[report_type].sections)
+    data = ReportsService.get_reports_data(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        emi_days=emi_days,
+        member_ids=member_ids,
+        group_ids=group_ids,
+        staff_ids=staff_ids,
+        loan_ids=loan_ids,
+        sections=list(needed_sections),
+        include_details=any(EXPORT_REPORTS[report_type].include_details for report_type in reports),
+    )
+    missing = [name for name in needed_sections if REPORT_SECTIONS[name] not in data]
+    if missing:
+        raise HTTPException(status_code=500, detail="Failed to fetch report data")
+
+    return StreamingResponse(
+        ExportService.iter_bundle(data, reports, sections, formats),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="Reports_{date.today()}.zip"'},
+    )
+
+
+@router.get("/export/{section}")
+def export_section_spreadsheet(
+    section: str,
+    format: str = Query("csv"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    emi_days: Optional[List[str]] = Query(None),
+    member_ids: Optional[List[int]] = Query(None),
+    group_ids: Optional[List[int]] = Query(None),
+    staff_ids: Optional[List[str]] = Query(None),
+    loan_ids: Optional[List[int]] = Query(None),
+):
+    """
+    Export one report section (metrics, summary, user, emi, collections) as CSV or XLSX.
+    Rows are written to the response as the report engine produces them.
+    """
+    if section not in SPREADSHEET_SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Invalid section. Use {', '.join(SPREADSHEET_SECTIONS)}")
+    if format not in SPREADSHEET_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use {', '.join(SPREADSHEET_FORMATS)}")
+
+    def section_rows():
+        # The response outlives the request dependencies, so the stream owns its session
+        db = SessionLocal()
+        try:
+            for item in ReportsService.iter_reports_data(
+                db,
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+                sections=[section],
+            ):
+                if item["section"] == "error":
+                    raise RuntimeError(item["message"])
+                if item["section"] == "metrics":
+                    yield from ExportService.metric_rows(item["data"])
+                elif item["section"] == section:
+                    yield item["data"]
+        finally:
+            db.close()
+
+    if format == "csv":
+        content = ExportService.iter_csv(section, section_rows())
+    else:
+        content = ExportService.iter_xlsx(section, section_rows())
+
+    return StreamingResponse(
+        content,
+        media_type=SPREADSHEET_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{ExportService.spreadsheet_filename(section, format)}"'},
+    )
+
+
+def _job_response(job: dict) -> dict:
+    """Job state as returned by the export job routes"""
+    job = {key: value for key, value in job.items() if key != "pid"}
+    job["download_url"] = f"/api/reports/export-jobs/{job['id']}/download" if job["status"] == JOB_COMPLETED else None
+    return job
+
+
+@router.post("/export-jobs", status_code=202)
+def create_export_job(request: ExportJobCreate, response: Response):
+    """
+    Queue a Word export to be rendered in the background.
+    report_type is one of financial-summary, user-summary, emi-summary or collections-summary.
+    Poll the returned job for its status and download the artifact once it is completed.
+    """
+    filters = request.model_dump(exclude={"report_type"})
+    try:
+        job = export_jobs.create_job(request.report_type, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response.headers["Location"] = f"/api/reports/export-jobs/{job['id']}"
+    return _job_response(job)
+
+
+@router.get("/export-jobs/{job_id}")
+def get_export_job(job_id: str):
+    """Get the status and progress of an export job"""
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return _job_response(job)
+
+
+@router.get("/export-jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    """Download the Word document rendered by a completed export job"""
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+
+    return FileResponse(export_jobs.artifact_path(job_id), media_type=DOCX_MEDIA_TYPE, filename=job["filename"])
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from database import get_db
 from schemas.staff_schema import StaffCreate, StaffUpdate, StaffResponse
@@ -29,9 +29,23 @@ def get_staff(staff_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[StaffResponse])
-def get_all_staff(skip: int = Query(0), limit: int = Query(100), db: Session = Depends(get_db)):
-    """Get all active staff members"""
-    staff = StaffService.get_all_staff(db, skip, limit)
+def get_all_staff(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    after: str = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all active staff members, newest first.
+    Page with the after cursor; the cursor of the next page is in the X-Next-Cursor header.
+    """
+    try:
+        staff, next_cursor = StaffService.get_all_staff(db, skip, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return staff
 
 
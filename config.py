@@ -9,6 +9,24 @@ class Settings(BaseSettings):
     DB_NAME: str
     
     DATABASE_URL: Optional[str] = None
+
+    REPORT_CACHE_MAX_ENTRIES: int = 128
+    REPORT_CACHE_TTL_SECONDS: int = 300
+    FILTER_OPTIONS_CACHE_TTL_SECONDS: int = 600
+    # Threads shared by all parallel report requests; each holds one DB connection while it runs
+    REPORT_SECTION_WORKERS: int = 4
+    # Exports are buffered in memory up to this size, then spill to an anonymous temp file
+    EXPORT_SPOOL_MAX_BYTES: int = 8 * 1024 * 1024
+    # Background export jobs: state and artifacts live under EXPORT_JOB_DIR (system temp dir when unset)
+    EXPORT_JOB_DIR: Optional[str] = None
+    EXPORT_JOB_WORKERS: int = 2
+    EXPORT_JOB_TTL_SECONDS: int = 3600
+    # Rendered exports are cached under EXPORT_CACHE_DIR (system temp dir when unset); 0 disables the cache
+    EXPORT_CACHE_DIR: Optional[str] = None
+    EXPORT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Processes rendering collections summary pages, EXPORT_RENDER_CHUNK_LOANS loans per task; 0 or 1 renders inline
+    EXPORT_RENDER_PROCESSES: int = 0
+    EXPORT_RENDER_CHUNK_LOANS: int = 100
     
     class Config:
         env_file = ".env"
@@ -11,6 +11,7 @@ from api.collection_routes import router as collection_router
 from api.billing_routes import router as billing_router
 from api.staff_routes import router as staff_router
 from api.reports_routes import router as reports_router
+from services.export_cache import export_cache
 import os
 
 #Base.metadata.create_all(bind=engine)
@@ -27,6 +28,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(health_router)
@@ -41,6 +43,11 @@ app.include_router(billing_router)
 app.include_router(staff_router)
 app.include_router(reports_router)
 
+@app.on_event("startup")
+def init_export_cache():
+    # Only the API process indexes the export cache, not the render workers that import it
+    export_cache.init()
+
 @app.get("/")
 async def root():
     return {
@@ -36,4 +36,4 @@ class Loan(Base):
     created_by = Column(String(255), nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     updated_by = Column(String(255), nullable=True)
-    assign_to = Column(String(255), nullable=True)
+    assign_to = Column(String(255), nullable=True, index=True)
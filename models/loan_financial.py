@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Numeric, DateTime, ForeignKey, Index
+from database import Base
+from datetime import datetime
+
+
+class LoanFinancial(Base):
+    """Per-loan (member_id NULL) and per-member financial figures projected from loan_member_emi and billing"""
+    __tablename__ = "loan_financials"
+
+    id = Column(Integer, primary_key=True, index=True)
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=False)
+    member_id = Column(Integer, ForeignKey("members.id"), nullable=True)
+    member_count = Column(Integer, default=0, nullable=False)
+    emi_count = Column(Integer, default=0, nullable=False)
+    paid_emi_count = Column(Integer, default=0, nullable=False)
+    emi_total = Column(Numeric(12, 2), default=0, nullable=False)
+    emi_paid = Column(Numeric(12, 2), default=0, nullable=False)
+    emi_overdue = Column(Numeric(12, 2), default=0, nullable=False)
+    next_emi_date = Column(DateTime, nullable=True)
+    next_emi_amount = Column(Numeric(10, 2), default=0, nullable=False)
+    billed_loan_amount = Column(Numeric(12, 2), default=0, nullable=False)
+    billed_interest = Column(Numeric(12, 2), default=0, nullable=False)
+    billed_payment = Column(Numeric(12, 2), default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_loan_financials_loan_member", "loan_id", "member_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Index
 from database import Base
 from datetime import datetime
 
@@ -17,3 +17,7 @@ class LoanMemberEmi(Base):
     created_at = Column(DateTime, default=datetime.now(), nullable=False)
     created_by = Column(String(255), default='System', nullable=False)
     updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_loan_member_emi_date_status", "emi_date", "emi_status"),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from datetime import datetime
+from database import Base
+
+
+class PaymentIdempotencyKey(Base):
+    """Client-supplied key of a processed EMI payment and the result returned for it, replayed on retries"""
+    __tablename__ = "payment_idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(255), nullable=False, unique=True, index=True)
+    emi_id = Column(Integer, ForeignKey("loan_member_emi.id"), nullable=False)
+    response = Column(JSON(none_as_null=True), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import List, Optional
+
+
+class ExportJobCreate(BaseModel):
+    report_type: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    emi_days: Optional[List[str]] = None
+    member_ids: Optional[List[int]] = None
+    group_ids: Optional[List[int]] = None
+    staff_ids: Optional[List[str]] = None
+    loan_ids: Optional[List[int]] = None
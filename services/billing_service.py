@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from models.billing import Billing
 from models.loan import Loan
 from models.loan_member import LoanMember
+from services.report_cache import report_cache
+from services.loan_financial_service import LoanFinancialService
 from datetime import datetime
 import logging
 
@@ -9,6 +11,20 @@ logger = logging.getLogger(__name__)
 
 
 class BillingService:
+    @staticmethod
+    def _billing_dict(billing: Billing) -> dict:
+        """Convert a billing row into the dict returned by the create methods"""
+        return {
+            'id': billing.id,
+            'loan_id': billing.loan_id,
+            'member_id': billing.member_id,
+            'member_group_id': billing.member_group_id,
+            'staff_id': getattr(billing, 'staff_id', None),
+            'amount': float(billing.amount),
+            'billing_code': billing.billing_code,
+            'type': billing.type,
+        }
+
     @staticmethod
     def create_billing_entry(
         db: Session,
@@ -21,8 +37,13 @@ class BillingService:
         member_group_id: int = None,
         created_by: str = "System",
         staff_id: str = None,
+        commit: bool = True,
     ) -> dict:
-        """Create a billing entry"""
+        """
+        Create a billing entry.
+        With commit=False the entry is only flushed into the caller's transaction and errors are raised;
+        the caller refreshes loan_financials, commits and invalidates the report cache.
+        """
         logger.info(f"Creating billing entry for loan_id: {loan_id}, member_id: {member_id}, billing_code: {billing_code}")
         try:
             billing = Billing(
@@ -38,21 +59,19 @@ class BillingService:
                 created_at=datetime.utcnow(),
             )
             db.add(billing)
-            db.commit()
-            db.refresh(billing)
+            if commit:
+                LoanFinancialService.refresh_loan(db, loan_id)
+                db.commit()
+                db.refresh(billing)
+                report_cache.invalidate_loans([loan_id])
+            else:
+                db.flush()
             logger.info(f"Successfully created billing entry: {billing.id}")
-            return {
-                'id': billing.id,
-                'loan_id': billing.loan_id,
-                'member_id': billing.member_id,
-                'member_group_id': billing.member_group_id,
-                'staff_id': getattr(billing, 'staff_id', None),
-                'amount': float(billing.amount),
-                'billing_code': billing.billing_code,
-                'type': billing.type,
-            }
+            return BillingService._billing_dict(billing)
         except Exception as e:
             logger.exception(f"Error creating billing entry: {str(e)}")
+            if not commit:
+                raise
             db.rollback()
             return {}
 
@@ -60,9 +79,14 @@ class BillingService:
     def create_loan_approval_billing(
         db: Session,
         loan_id: int,
-        created_by: str = "System"
+        created_by: str = "System",
+        commit: bool = True,
     ) -> list:
-        """Create billing entries when loan is approved"""
+        """
+        Create billing entries when loan is approved.
+        All entries are inserted with one flush and committed once. With commit=False they join the
+        caller's transaction and errors are raised; the caller refreshes loan_financials and commits.
+        """
         logger.info(f"Creating approval billing entries for loan_id: {loan_id}")
         try:
             # Get loan details
@@ -77,102 +101,65 @@ class BillingService:
                 logger.warning(f"No loan members found for loan_id: {loan_id}")
                 return []
 
-            billing_entries = []
+            processing_fee = float(loan.processing_fees or 0)
+            insurance_fee = float(loan.insurance_fees or 0)
+            other_fee = float(loan.other_fees or 0)
+            interest_fee = float(loan.interest_amount or 0)
+            now = datetime.utcnow()
+
+            billings = []
 
             # Create billing entries for each member
             for loan_member in loan_members:
                 # 1. Loan Amount (DEBIT)
-                loan_amount_entry = BillingService.create_billing_entry(
-                    db=db,
-                    loan_id=loan_id,
-                    member_id=loan_member.member_id,
-                    member_group_id=loan_member.member_group_id,
-                    staff_id=loan.field_officer_id,
-                    amount=float(loan_member.amount),
-                    billing_code="LOAN_AMOUNT",
-                    type="DEBIT",
-                    description=f"Loan amount for member {loan_member.name}",
-                    created_by=created_by
-                )
-                if loan_amount_entry:
-                    billing_entries.append(loan_amount_entry)
-
-                # 2. Processing Fee (DEBIT)
-                processing_fee = float(loan.processing_fees or 0)
-                if processing_fee > 0:
-                    processing_fee_entry = BillingService.create_billing_entry(
-                        db=db,
-                        loan_id=loan_id,
-                        member_id=loan_member.member_id,
-                        member_group_id=loan_member.member_group_id,
-                        staff_id=loan.field_officer_id,
-                        amount=processing_fee,
-                        billing_code="PROCESSING_FEE",
-                        type="CREDIT",
-                        description=f"Processing fee for member {loan_member.name}",
-                        created_by=created_by
-                    )
-                    if processing_fee_entry:
-                        billing_entries.append(processing_fee_entry)
-
-                # 3. Insurance Fee (DEBIT)
-                insurance_fee = float(loan.insurance_fees or 0)
-                if insurance_fee > 0:
-                    insurance_fee_entry = BillingService.create_billing_entry(
-                        db=db,
+                entries = [(float(loan_member.amount), "LOAN_AMOUNT", "DEBIT", f"Loan amount for member {loan_member.name}")]
+                # Fees and interest are only billed when set
+                fee_entries = [
+                    # 2. Processing Fee (DEBIT)
+                    (processing_fee, "PROCESSING_FEE", "CREDIT", f"Processing fee for member {loan_member.name}"),
+                    # 3. Insurance Fee (DEBIT)
+                    (insurance_fee, "INSURANCE_FEE", "DEBIT", f"Insurance fee for member {loan_member.name}"),
+                    # 4. Other Fee (DEBIT)
+                    (other_fee, "OTHER_FEE", "CREDIT", f"Other fee for member {loan_member.name}"),
+                    # 5. Intrest (Credit)
+                    (interest_fee, "INTEREST", "CREDIT", f"Interest for member {loan_member.name}"),
+                ]
+                entries.extend(entry for entry in fee_entries if entry[0] > 0)
+
+                for amount, billing_code, entry_type, description in entries:
+                    billings.append(Billing(
                         loan_id=loan_id,
                         member_id=loan_member.member_id,
                         member_group_id=loan_member.member_group_id,
                         staff_id=loan.field_officer_id,
-                        amount=insurance_fee,
-                        billing_code="INSURANCE_FEE",
-                        type="DEBIT",
-                        description=f"Insurance fee for member {loan_member.name}",
-                        created_by=created_by
-                    )
-                    if insurance_fee_entry:
-                        billing_entries.append(insurance_fee_entry)
-
-                # 4. Other Fee (DEBIT)
-                other_fee = float(loan.other_fees or 0)
-                if other_fee > 0:
-                    other_fee_entry = BillingService.create_billing_entry(
-                        db=db,
-                        loan_id=loan_id,
-                        member_id=loan_member.member_id,
-                        member_group_id=loan_member.member_group_id,
-                        staff_id=loan.field_officer_id,
-                        amount=other_fee,
-                        billing_code="OTHER_FEE",
-                        type="CREDIT",
-                        description=f"Other fee for member {loan_member.name}",
-                        created_by=created_by
-                    )
-                    if other_fee_entry:
-                        billing_entries.append(other_fee_entry)
-                # 5. Intrest (Credit)
-                interest_fee = float(loan.interest_amount or 0)
-                if interest_fee > 0:
-                    interest_fee_entry = BillingService.create_billing_entry(
-                        db=db,
-                        loan_id=loan_id,
-                        member_id=loan_member.member_id,
-                        member_group_id=loan_member.member_group_id,
-                        staff_id=loan.field_officer_id,
-                        amount=interest_fee,
-                        billing_code="INTEREST",
-                        type="CREDIT",
-                        description=f"Interest for member {loan_member.name}",
-                        created_by=created_by
-                    )
-                    if interest_fee_entry:
-                        billing_entries.append(interest_fee_entry)
+                        amount=amount,
+                        billing_code=billing_code,
+                        type=entry_type,
+                        description=description,
+                        created_by=created_by,
+                        created_at=now,
+                    ))
+
+            db.add_all(billings)
+
+            if commit:
+                # Project the approval billing into loan_financials; this flushes the entries
+                LoanFinancialService.refresh_loan(db, loan_id)
+            else:
+                db.flush()
+            billing_entries = [BillingService._billing_dict(billing) for billing in billings]
+            if commit:
+                db.commit()
+                report_cache.invalidate_loans([loan_id])
 
             logger.info(f"Successfully created {len(billing_entries)} billing entries for loan_id: {loan_id}")
             return billing_entries
 
         except Exception as e:
             logger.exception(f"Error creating approval billing entries: {str(e)}")
+            if not commit:
+                raise
+            db.rollback()
             return []
 
     @staticmethod
@@ -184,8 +171,9 @@ class BillingService:
         amount: float,
         created_by: str = "System",
         staff_id: str = None,
+        commit: bool = True,
     ) -> dict:
-        """Create billing entry when payment is made"""
+        """Create billing entry when payment is made; commit works as in create_billing_entry"""
         logger.info(f"Creating payment billing entry for loan_id: {loan_id}, member_id: {member_id}, amount: {amount}")
         try:
             # Create CREDIT entry for payment
@@ -200,12 +188,15 @@ class BillingService:
                 type="CREDIT",
                 description=f"Payment received",
                 created_by=created_by,
+                commit=commit,
             )
             logger.info(f"Successfully created payment billing entry")
             return payment_entry
 
         except Exception as e:
             logger.exception(f"Error creating payment billing entry: {str(e)}")
+            if not commit:
+                raise
             return {}
 
     @staticmethod
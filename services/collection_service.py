@@ -1,161 +1,67 @@
+from sqlalchemy import case, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from models.loan import Loan
 from models.loan_member import LoanMember
 from models.loan_member_emi import LoanMemberEmi
 from models.member_group import MemberGroup
+from models.billing import Billing
+from models.payment_idempotency_key import PaymentIdempotencyKey
 from services.billing_service import BillingService
-from datetime import datetime
+from services.report_cache import report_cache
+from services.loan_financial_service import LoanFinancialService
+from services.pagination import paginate_keyset
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import logging
 
 logger = logging.getLogger(__name__)
 
+EMI_CONFLICT_MESSAGE = "EMI was updated by another payment, please retry"
+
 
 class CollectionService:
     @staticmethod
-    def get_collection_list(db: Session, skip: int = 0, limit: int = 100) -> list:
+    def _build_collections(db: Session, loans: list) -> list:
         """
-        Get collection list with approved loans only.
-        Combines loans, loan_members, and loan_member_emi data.
+        Build collection objects for the given loans, in order.
+        Members, member groups and EMIs are loaded for all loans at once, so the query count
+        does not grow with the number of loans.
         """
-        logger.info("Fetching collection list for approved loans")
-        try:
-            # Fetch only approved loans
-            approved_loans = db.query(Loan).filter(
-                Loan.loan_status == 'Approved',
-                Loan.del_mark != 'Y'
-            ).order_by(Loan.id.desc()).offset(skip).limit(limit).all()
-
-            logger.info(f"Found {len(approved_loans)} approved loans")
-
-            collection_list = []
-
-            for loan in approved_loans:
-                # Get loan members for this loan
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-
-                logger.debug(f"Loan {loan.loan_id}: Found {len(loan_members)} members")
-
-                # Get member group name
-                group_name = ''
-                if loan.member_group_id:
-                    member_group = db.query(MemberGroup).filter(
-                        MemberGroup.id == loan.member_group_id
-                    ).first()
-                    if member_group:
-                        group_name = member_group.name
-
-                # Get EMI schedule for this loan
-                emi_schedule = db.query(LoanMemberEmi).filter(
-                    LoanMemberEmi.loan_id == loan.id
-                ).order_by(LoanMemberEmi.emi_date).all()
-
-                logger.debug(f"Loan {loan.loan_id}: Found {len(emi_schedule)} EMI records")
-
-                # Calculate totals from loan_members table
-                total_collected = sum(float(member.collected or 0) for member in loan_members)
-                total_pending = sum(float(member.pending or 0) for member in loan_members)
-                total_principal = sum(float(member.amount or 0) for member in loan_members)
-                per_member_interest = float(getattr(loan, 'interest_amount', 0) or 0)
-                total_interest = per_member_interest * len(loan_members)
-                
-                logger.debug(f"Loan {loan.loan_id}: Total Collected: {total_collected}, Total Pending: {total_pending}")
-
-                # Build members array with EMI data
-                members = []
-                for loan_member in loan_members:
-                    # Get EMI records for this member
-                    member_emis = [emi for emi in emi_schedule if emi.member_id == loan_member.member_id]
-                    
-                    # Calculate member totals from loan_members table
-                    member_collected = float(loan_member.collected or 0)
-                    member_pending = float(loan_member.pending or 0)
-                    member_pending_with_interest = member_pending + per_member_interest
-                    member_total = member_collected + member_pending_with_interest
-
-                    members.append({
-                        'id': loan_member.member_id,
-                        'name': loan_member.name,
-                        'place': loan_member.place,
-                        'phone': loan_member.phone,
-                        'collectedAmount': member_collected,
-                        'pendingAmount': member_pending_with_interest,
-                        'advanceAmount': float(getattr(loan_member, 'advance', 0) or 0),
-                        'totalAmount': member_total,
-                        'emiSchedule': [
-                            {
-                                'id': emi.id,
-                                'dueDate': emi.emi_date.isoformat() if emi.emi_date else None,
-                                'amount': float(emi.emi_amount or 0),
-                                'status': emi.emi_status if hasattr(emi, 'emi_status') else 'Pending',
-                                'label': emi.label if hasattr(emi, 'label') else 'UPCOMING',
-                            }
-                            for emi in member_emis
-                        ]
-                    })
-
-                # Determine collection status based on EMI status
-                collection_status = 'Active'
-                if total_pending == 0:
-                    collection_status = 'Completed'
-                elif any(emi.emi_status == 'Overdue' if hasattr(emi, 'emi_status') else False for emi in emi_schedule):
-                    collection_status = 'Overdue'
-
-                # Build collection object
-                collection = {
-                    'id': loan.id,
-                    'loanId': loan.loan_id,
-                    'groupName': group_name,
-                    'memberGroupId': loan.member_group_id,
-                    'members': members,
-                    'loanAmount': float(total_principal + total_interest),
-                    'collectedAmount': total_collected,
-                    'pendingAmount': float(total_pending + total_interest),
-                    'frequency': loan.repayment_frequency or 'month',
-                    'emiDay': loan.emi_day or 'N/A',
-                    'assign_to': loan.assign_to or None,
-                    'createdDate': loan.created_at.isoformat() if loan.created_at else None,
-                    'status': collection_status,
-                    'nextDueDate': emi_schedule[0].emi_date.isoformat() if emi_schedule and emi_schedule[0].emi_date else None,
-                    'loanStartDate': loan.loan_start_date.isoformat() if loan.loan_start_date else None,
-                    'interestRate': float(loan.interest_rate or 0),
-                    'loanTenure': loan.loan_tenure,
-                    'monthlyEmi': float(loan.monthly_emi or 0),
-                }
-
-                collection_list.append(collection)
-
-            logger.info(f"Successfully built collection list with {len(collection_list)} items")
-            return collection_list
-
-        except Exception as e:
-            logger.exception(f"Error fetching collection list: {str(e)}")
+        if not loans:
             return []
 
-    @staticmethod
-    def get_collection_by_loan_id(db: Session, loan_id: int) -> dict:
-        """Get collection details for a specific loan"""
-        logger.info(f"Fetching collection details for loan_id: {loan_id}")
-        try:
-            loan = db.query(Loan).filter(Loan.id == loan_id).first()
-            if not loan:
-                logger.error(f"Loan not found: {loan_id}")
-                return {}
-
-            # Get member group name
-            group_name = ''
-            if loan.member_group_id:
-                member_group = db.query(MemberGroup).filter(
-                    MemberGroup.id == loan.member_group_id
-                ).first()
-                if member_group:
-                    group_name = member_group.name
-
-            loan_members = db.query(LoanMember).filter(LoanMember.loan_id == loan_id).all()
-            emi_schedule = db.query(LoanMemberEmi).filter(LoanMemberEmi.loan_id == loan_id).order_by(
-                LoanMemberEmi.emi_date
-            ).all()
+        loan_ids = [loan.id for loan in loans]
+
+        # Get loan members for all loans
+        members_by_loan = {}
+        for loan_member in db.query(LoanMember).filter(
+            LoanMember.loan_id.in_(loan_ids)
+        ).order_by(LoanMember.id).all():
+            members_by_loan.setdefault(loan_member.loan_id, []).append(loan_member)
+
+        # Get member group names
+        group_ids = {loan.member_group_id for loan in loans if loan.member_group_id}
+        group_names = {}
+        if group_ids:
+            group_names = dict(
+                db.query(MemberGroup.id, MemberGroup.name).filter(MemberGroup.id.in_(group_ids)).all()
+            )
+
+        # Get EMI schedules, grouped by loan and by (loan, member) in one pass
+        emis_by_loan = {}
+        emis_by_member = {}
+        for emi in db.query(LoanMemberEmi).filter(
+            LoanMemberEmi.loan_id.in_(loan_ids)
+        ).order_by(LoanMemberEmi.emi_date, LoanMemberEmi.id).all():
+            emis_by_loan.setdefault(emi.loan_id, []).append(emi)
+            emis_by_member.setdefault((emi.loan_id, emi.member_id), []).append(emi)
+
+        collection_list = []
+        for loan in loans:
+            loan_members = members_by_loan.get(loan.id, [])
+            emi_schedule = emis_by_loan.get(loan.id, [])
+            logger.debug(f"Loan {loan.loan_id}: Found {len(loan_members)} members, {len(emi_schedule)} EMI records")
 
             # Calculate totals from loan_members table
             total_collected = sum(float(member.collected or 0) for member in loan_members)
@@ -164,11 +70,12 @@ class CollectionService:
             per_member_interest = float(getattr(loan, 'interest_amount', 0) or 0)
             total_interest = per_member_interest * len(loan_members)
 
+            # Build members array with EMI data
             members = []
             for loan_member in loan_members:
-                member_emis = [emi for emi in emi_schedule if emi.member_id == loan_member.member_id]
-                
-                # Get member totals from loan_members table
+                member_emis = emis_by_member.get((loan.id, loan_member.member_id), [])
+
+                # Calculate member totals from loan_members table
                 member_collected = float(loan_member.collected or 0)
                 member_pending = float(loan_member.pending or 0)
                 member_pending_with_interest = member_pending + per_member_interest
@@ -195,16 +102,18 @@ class CollectionService:
                     ]
                 })
 
+            # Determine collection status based on EMI status
             collection_status = 'Active'
             if total_pending == 0:
                 collection_status = 'Completed'
             elif any(emi.emi_status == 'Overdue' if hasattr(emi, 'emi_status') else False for emi in emi_schedule):
                 collection_status = 'Overdue'
 
-            collection = {
+            # Build collection object
+            collection_list.append({
                 'id': loan.id,
                 'loanId': loan.loan_id,
-                'groupName': group_name,
+                'groupName': group_names.get(loan.member_group_id, ''),
                 'memberGroupId': loan.member_group_id,
                 'members': members,
                 'loanAmount': float(total_principal + total_interest),
@@ -220,7 +129,57 @@ class CollectionService:
                 'interestRate': float(loan.interest_rate or 0),
                 'loanTenure': loan.loan_tenure,
                 'monthlyEmi': float(loan.monthly_emi or 0),
-            }
+            })
+
+        return collection_list
+
+    @staticmethod
+    def get_collection_list(db: Session, skip: int = 0, limit: int = 100, after: str = None) -> tuple:
+        """
+        Get one page of the collection list with approved loans only, newest first.
+        Combines loans, loan_members, and loan_member_emi data with a fixed number of queries.
+        Returns the collections and the cursor of the next page; pass it as after to continue.
+        Raises ValueError for an invalid cursor.
+        """
+        logger.info("Fetching collection list for approved loans")
+        try:
+            # Fetch only approved loans
+            approved_loans, next_cursor = paginate_keyset(
+                db.query(Loan).filter(
+                    Loan.loan_status == 'Approved',
+                    Loan.del_mark != 'Y'
+                ),
+                [Loan.id],
+                limit,
+                cursor=after,
+                descending=True,
+                offset=skip,
+            )
+
+            logger.info(f"Found {len(approved_loans)} approved loans")
+
+            collection_list = CollectionService._build_collections(db, approved_loans)
+
+            logger.info(f"Successfully built collection list with {len(collection_list)} items")
+            return collection_list, next_cursor
+
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.exception(f"Error fetching collection list: {str(e)}")
+            return [], None
+
+    @staticmethod
+    def get_collection_by_loan_id(db: Session, loan_id: int) -> dict:
+        """Get collection details for a specific loan"""
+        logger.info(f"Fetching collection details for loan_id: {loan_id}")
+        try:
+            loan = db.query(Loan).filter(Loan.id == loan_id).first()
+            if not loan:
+                logger.error(f"Loan not found: {loan_id}")
+                return {}
+
+            collection = CollectionService._build_collections(db, [loan])[0]
 
             logger.info(f"Successfully fetched collection details for loan_id: {loan_id}")
             return collection
@@ -229,6 +188,155 @@ class CollectionService:
             logger.exception(f"Error fetching collection details: {str(e)}")
             return {}
 
+    @staticmethod
+    def get_due_collections(db: Session, staff_id: str, due_date: date) -> list:
+        """
+        Get the route sheet of a staff member for a day: one compact row per unpaid EMI that is due
+        on due_date or overdue, for approved loans assigned to the staff member.
+        Overdue EMIs from any earlier date are included on purpose, as they are collected on the same
+        visit, so the date range has no lower bound: the work follows the staff member's unpaid EMIs
+        up to the day, not the whole portfolio.
+        """
+        logger.info(f"Fetching due collections for staff {staff_id} on {due_date}")
+        day_end = datetime.combine(due_date + timedelta(days=1), datetime.min.time())
+        day_start = datetime.combine(due_date, datetime.min.time())
+
+        rows = db.query(
+            LoanMemberEmi.id,
+            LoanMemberEmi.loan_id,
+            LoanMemberEmi.member_id,
+            LoanMemberEmi.emi_date,
+            LoanMemberEmi.emi_amount,
+            LoanMemberEmi.emi_status,
+            Loan.loan_id,
+            MemberGroup.name,
+            LoanMember.name,
+            LoanMember.place,
+            LoanMember.phone,
+        ).join(
+            Loan, Loan.id == LoanMemberEmi.loan_id
+        ).join(
+            LoanMember,
+            (LoanMember.loan_id == LoanMemberEmi.loan_id) & (LoanMember.member_id == LoanMemberEmi.member_id),
+        ).outerjoin(
+            MemberGroup, MemberGroup.id == Loan.member_group_id
+        ).filter(
+            LoanMemberEmi.emi_date < day_end,
+            LoanMemberEmi.emi_status != 'PAID',
+            Loan.assign_to == staff_id,
+            Loan.loan_status == 'Approved',
+            Loan.del_mark != 'Y',
+        ).order_by(
+            LoanMemberEmi.loan_id, LoanMemberEmi.member_id, LoanMemberEmi.emi_date, LoanMemberEmi.id
+        ).all()
+
+        due_collections = [
+            {
+                'emiId': emi_id,
+                'id': loan_id,
+                'loanId': loan_code,
+                'groupName': group_name or '',
+                'memberId': member_id,
+                'name': name,
+                'place': place,
+                'phone': phone,
+                'dueDate': emi_date.isoformat() if emi_date else None,
+                'amount': float(emi_amount or 0),
+                'status': emi_status,
+                'overdue': emi_date < day_start,
+            }
+            for emi_id, loan_id, member_id, emi_date, emi_amount, emi_status, loan_code, group_name, name, place, phone in rows
+        ]
+
+        logger.info(f"Found {len(due_collections)} due EMIs for staff {staff_id}")
+        return due_collections
+
+    @staticmethod
+    def _get_idempotency_record(db: Session, idempotency_key: str):
+        """Get the stored record of an idempotency key, or None if the key has not been used"""
+        return db.query(PaymentIdempotencyKey).filter(
+            PaymentIdempotencyKey.idempotency_key == idempotency_key
+        ).first()
+
+    @staticmethod
+    def _replay_payment(record, emi_id: int) -> dict:
+        """
+        Get the result stored for an idempotency key that was already used.
+        Raises ValueError if the key belongs to another EMI or its payment has not finished yet.
+        record is None when a concurrent payment reserved the key and then rolled back.
+        """
+        if record is None:
+            raise ValueError("A payment with this Idempotency-Key is still being processed")
+        if record.emi_id != emi_id:
+            raise ValueError("Idempotency-Key was already used for another payment")
+        if record.response is None:
+            raise ValueError("A payment with this Idempotency-Key is still being processed")
+        logger.info(f"Replaying payment result for EMI ID: {emi_id}")
+        return record.response
+
+    @staticmethod
+    def _mark_emis_paid(db: Session, emis: list) -> set:
+        """
+        Set the given EMIs to PAID in the database with one locking read and one UPDATE.
+        Each EMI is checked against the status it was read with, so an EMI a concurrent payment
+        changed first is left alone. Returns the ids of the EMIs that were updated.
+        """
+        if not emis:
+            return set()
+
+        read_statuses = {emi.id: emi.emi_status for emi in emis}
+        # Lock the rows in id order, so they keep their status until commit and batches can't deadlock
+        current_statuses = db.query(LoanMemberEmi.id, LoanMemberEmi.emi_status).filter(
+            LoanMemberEmi.id.in_(read_statuses)
+        ).order_by(LoanMemberEmi.id).with_for_update().all()
+        paid_ids = {emi_id for emi_id, status in current_statuses if status == read_statuses[emi_id]}
+
+        if paid_ids:
+            db.query(LoanMemberEmi).filter(LoanMemberEmi.id.in_(paid_ids)).update(
+                {LoanMemberEmi.emi_status: 'PAID', LoanMemberEmi.label: 'PAID', LoanMemberEmi.updated_at: datetime.now()},
+                synchronize_session=False,
+            )
+        return paid_ids
+
+    @staticmethod
+    def _add_member_payments(db: Session, totals: dict) -> dict:
+        """
+        Add payments to loan member balances as atomic SQL increments, so concurrent payments for the
+        same member cannot overwrite each other. totals maps loan member ids to (amount, advance);
+        every member is updated by one UPDATE with a CASE per column, and pending is clamped at zero
+        in SQL. Returns the balances after the update by loan member id.
+        """
+        if not totals:
+            return {}
+
+        amounts = case({loan_member_id: amount for loan_member_id, (amount, _) in totals.items()}, value=LoanMember.id, else_=0)
+        advances = case({loan_member_id: advance for loan_member_id, (_, advance) in totals.items()}, value=LoanMember.id, else_=0)
+        pending = LoanMember.pending - amounts
+        db.query(LoanMember).filter(LoanMember.id.in_(totals)).update({
+            LoanMember.collected: LoanMember.collected + amounts,
+            LoanMember.pending: case((pending < 0, 0), else_=pending),
+            LoanMember.advance: LoanMember.advance + advances,
+        }, synchronize_session=False)
+
+        return {
+            row.id: row
+            for row in db.query(
+                LoanMember.id, LoanMember.collected, LoanMember.pending, LoanMember.advance
+            ).filter(LoanMember.id.in_(totals)).all()
+        }
+
+    @staticmethod
+    def _payment_result(emi_id: int, balance) -> dict:
+        """Build the result of a processed payment from the loan member balance after it"""
+        return {
+            'id': emi_id,
+            'emi_status': 'PAID',
+            'label': 'PAID',
+            'member_collected': float(balance.collected or 0) if balance else 0,
+            'member_pending': float(balance.pending or 0) if balance else 0,
+            'member_advance': float(balance.advance or 0) if balance else 0,
+        }
+
     @staticmethod
     def process_emi_payment(
         db: Session,
@@ -237,9 +345,20 @@ class CollectionService:
         paid_by: str = "System",
         loan_advance: float = 0,
         credit_officer: str = "",
+        idempotency_key: str = None,
     ) -> dict:
-        """Process EMI payment and update status"""
+        """
+        Process EMI payment and update status.
+        The EMI, balances, billing entries and loan_financials are committed together in one transaction.
+        With an idempotency_key, the result is stored with the payment and a retry with the same key
+        gets it back without touching the EMI, loan member or billing rows.
+        """
         logger.info(f"Processing payment for EMI ID: {emi_id}, Amount: {amount}")
+        if idempotency_key:
+            record = CollectionService._get_idempotency_record(db, idempotency_key)
+            if record:
+                return CollectionService._replay_payment(record, emi_id)
+
         try:
             if not (credit_officer or "").strip():
                 raise ValueError("Credit Officer is required")
@@ -250,23 +369,36 @@ class CollectionService:
                 logger.error(f"EMI not found: {emi_id}")
                 return {}
 
-            # Update EMI status and label
-            emi.emi_status = 'PAID'
-            emi.label = 'PAID'
-            emi.updated_at = datetime.now()
+            if idempotency_key:
+                # Reserve the key before changing anything, so a concurrent retry stops here
+                record = PaymentIdempotencyKey(idempotency_key=idempotency_key, emi_id=emi_id)
+                db.add(record)
+                try:
+                    db.flush()
+                except IntegrityError:
+                    db.rollback()
+                    return CollectionService._replay_payment(
+                        CollectionService._get_idempotency_record(db, idempotency_key), emi_id
+                    )
+
+            # Update EMI status and label, unless another payment changed the EMI since it was read
+            previous_status = emi.emi_status
+            if emi.id not in CollectionService._mark_emis_paid(db, [emi]):
+                raise ValueError(EMI_CONFLICT_MESSAGE)
 
             # Get the loan member to update collected and pending amounts
             loan_member = db.query(LoanMember).filter(LoanMember.loan_id == emi.loan_id , LoanMember.member_id == emi.member_id).first()
+            balance = None
+            billed_payments = []
             if loan_member:
                 billing_created_by = credit_officer or paid_by
                 billing_staff_id = credit_officer or None
 
-                # Update collected and pending amounts
-                loan_member.collected = float(loan_member.collected or 0) + float(amount)
-                loan_member.pending = float(loan_member.pending or 0) - float(amount)
-                if loan_member.pending < 0:
-                    loan_member.pending = 0
-                logger.debug(f"Updated loan member {loan_member.id}: collected={loan_member.collected}, pending={loan_member.pending}")
+                # Update collected, pending and advance amounts in the database
+                balance = CollectionService._add_member_payments(db, {
+                    loan_member.id: (Decimal(str(amount)), Decimal(str(loan_advance or 0))),
+                })[loan_member.id]
+                logger.debug(f"Updated loan member {loan_member.id}: collected={balance.collected}, pending={balance.pending}")
 
                 # Create billing entry for payment (CREDIT)
                 BillingService.create_payment_billing(
@@ -277,12 +409,12 @@ class CollectionService:
                     amount=amount,
                     created_by=billing_created_by,
                     staff_id=billing_staff_id,
+                    commit=False,
                 )
+                billed_payments.append((emi.loan_id, emi.member_id, amount))
 
-                # If loan advance provided, update advance and create billing entry
+                # If loan advance provided, create billing entry
                 if float(loan_advance or 0) > 0:
-                    loan_member.advance = float(getattr(loan_member, 'advance', 0) or 0) + float(loan_advance)
-
                     BillingService.create_billing_entry(
                         db=db,
                         loan_id=emi.loan_id,
@@ -294,22 +426,240 @@ class CollectionService:
                         description="Loan advance received",
                         created_by=billing_created_by,
                         staff_id=billing_staff_id,
+                        commit=False,
                     )
 
+            # Add the payment to loan_financials in the same transaction
+            LoanFinancialService.apply_payments(
+                db,
+                [(emi.loan_id, emi.member_id, emi.emi_date, emi.emi_amount, previous_status)],
+                billed_payments,
+            )
+
+            result = CollectionService._payment_result(emi_id, balance)
+            if idempotency_key:
+                record.response = result
+
             db.commit()
-            db.refresh(emi)
+            report_cache.invalidate_loans([emi.loan_id])
 
             logger.info(f"Successfully processed payment for EMI ID: {emi_id}")
-            return {
-                'id': emi.id,
-                'emi_status': emi.emi_status,
-                'label': emi.label,
-                'member_collected': float(loan_member.collected or 0) if loan_member else 0,
-                'member_pending': float(loan_member.pending or 0) if loan_member else 0,
-                'member_advance': float(getattr(loan_member, 'advance', 0) or 0) if loan_member else 0,
-            }
+            return result
 
+        except ValueError:
+            db.rollback()
+            raise
         except Exception as e:
             logger.exception(f"Error processing EMI payment: {str(e)}")
             db.rollback()
             return {}
+
+    @staticmethod
+    def process_emi_payments(db: Session, payments: list) -> list:
+        """
+        Process a batch of EMI payments, as synced by a field officer after a group meeting.
+        Each payment is a dict with the fields of process_emi_payment. EMIs and loan members are
+        loaded with one query each, and all valid payments are applied in a single transaction
+        with the billing rows written by one bulk insert. Returns one result per payment, in order;
+        invalid payments, repeats of an EMI already paid earlier in the batch and payments for an EMI a
+        concurrent payment changed first fail on their own, and the rest are committed. Any other error rolls back and fails every applied payment.
+        Payments with an idempotency_key that was already used get the stored result back.
+        """
+        logger.info(f"Processing batch of {len(payments)} EMI payments")
+        results = [None] * len(payments)
+
+        idempotency_keys = {payment['idempotency_key'] for payment in payments if payment.get('idempotency_key')}
+        idempotency_records = {}
+        if idempotency_keys:
+            idempotency_records = {
+                record.idempotency_key: record
+                for record in db.query(PaymentIdempotencyKey).filter(
+                    PaymentIdempotencyKey.idempotency_key.in_(idempotency_keys)
+                ).all()
+            }
+        # Index of the payment that first used each new key in this batch
+        key_owners = {}
+        repeats = []
+        # Index of the payment that first paid each EMI in this batch
+        emi_owners = {}
+
+        emi_ids = {payment['emi_id'] for payment in payments}
+        emis = {emi.id: emi for emi in db.query(LoanMemberEmi).filter(LoanMemberEmi.id.in_(emi_ids)).all()}
+
+        loan_ids = {emi.loan_id for emi in emis.values()}
+        loan_members = {}
+        if loan_ids:
+            for loan_member in db.query(LoanMember).filter(
+                LoanMember.loan_id.in_(loan_ids)
+            ).order_by(LoanMember.id).all():
+                # First row wins, as with .first() in process_emi_payment
+                loan_members.setdefault((loan_member.loan_id, loan_member.member_id), loan_member)
+
+        applied = []
+        for index, payment in enumerate(payments):
+            emi_id = payment['emi_id']
+            credit_officer = (payment.get('credit_officer') or "").strip()
+            idempotency_key = payment.get('idempotency_key')
+
+            if idempotency_key in idempotency_records:
+                try:
+                    data = CollectionService._replay_payment(idempotency_records[idempotency_key], emi_id)
+                    results[index] = {'emi_id': emi_id, 'success': True, 'message': "Payment processed successfully", 'data': data}
+                except ValueError as e:
+                    results[index] = {'emi_id': emi_id, 'success': False, 'message': str(e), 'data': {}}
+                continue
+            if idempotency_key in key_owners:
+                repeats.append((index, key_owners[idempotency_key]))
+                continue
+
+            emi = emis.get(emi_id)
+            if not credit_officer:
+                results[index] = {'emi_id': emi_id, 'success': False, 'message': "Credit Officer is required", 'data': {}}
+                continue
+            if not emi:
+                results[index] = {'emi_id': emi_id, 'success': False, 'message': "EMI not found", 'data': {}}
+                continue
+
+            if emi_id in emi_owners:
+                results[index] = {'emi_id': emi_id, 'success': False, 'message': "EMI is already paid earlier in this batch", 'data': {}}
+                continue
+
+            applied.append((index, emi, loan_members.get((emi.loan_id, emi.member_id))))
+            emi_owners[emi_id] = index
+            if idempotency_key:
+                key_owners[idempotency_key] = index
+
+        if not applied:
+            return CollectionService._fill_repeats(payments, results, repeats)
+
+        try:
+            # Status each EMI was read with, before this batch marks it PAID
+            previous_statuses = {emi.id: emi.emi_status for _, emi, _ in applied}
+            paid_ids = CollectionService._mark_emis_paid(db, [emi for _, emi, _ in applied])
+
+            # Payments for an EMI a concurrent payment changed first fail on their own
+            for index, emi, _ in applied:
+                if emi.id not in paid_ids:
+                    results[index] = {'emi_id': emi.id, 'success': False, 'message': EMI_CONFLICT_MESSAGE, 'data': {}}
+            applied = [(index, emi, loan_member) for index, emi, loan_member in applied if emi.id in paid_ids]
+
+            member_totals = {}
+            billings = []
+            billed_payments = []
+            for index, emi, loan_member in applied:
+                if not loan_member:
+                    continue
+                payment = payments[index]
+                amount = float(payment['amount'])
+                loan_advance = float(payment.get('loan_advance') or 0)
+                credit_officer = payment['credit_officer'].strip()
+
+                totals = member_totals.setdefault(loan_member.id, [Decimal("0"), Decimal("0")])
+                totals[0] += Decimal(str(amount))
+
+                billings.append(dict(
+                    loan_id=emi.loan_id,
+                    member_id=emi.member_id,
+                    member_group_id=loan_member.member_group_id,
+                    staff_id=credit_officer,
+                    amount=amount,
+                    billing_code="PAYMENT",
+                    type="CREDIT",
+                    description="Payment received",
+                    created_by=credit_officer,
+                    created_at=datetime.utcnow(),
+                ))
+                billed_payments.append((emi.loan_id, emi.member_id, amount))
+
+                if loan_advance > 0:
+                    totals[1] += Decimal(str(loan_advance))
+                    billings.append(dict(
+                        loan_id=emi.loan_id,
+                        member_id=emi.member_id,
+                        member_group_id=loan_member.member_group_id,
+                        staff_id=credit_officer,
+                        amount=loan_advance,
+                        billing_code="LOAN_ADVANCE",
+                        type="CREDIT",
+                        description="Loan advance received",
+                        created_by=credit_officer,
+                        created_at=datetime.utcnow(),
+                    ))
+
+            balances = CollectionService._add_member_payments(db, member_totals)
+
+            # A loan member paid more than once in the batch shows its balances after the whole batch
+            applied_results = {
+                index: {
+                    'emi_id': emi.id,
+                    'success': True,
+                    'message': "Payment processed successfully",
+                    'data': CollectionService._payment_result(emi.id, balances.get(loan_member.id) if loan_member else None),
+                }
+                for index, emi, loan_member in applied
+            }
+
+            if billings:
+                db.execute(insert(Billing), billings)
+            db.add_all([
+                PaymentIdempotencyKey(
+                    idempotency_key=idempotency_key,
+                    emi_id=applied_results[index]['emi_id'],
+                    response=applied_results[index]['data'],
+                )
+                for idempotency_key, index in key_owners.items()
+                if index in applied_results
+            ])
+            LoanFinancialService.apply_payments(
+                db,
+                [
+                    (emi.loan_id, emi.member_id, emi.emi_date, emi.emi_amount, previous_statuses[emi.id])
+                    for _, emi, _ in applied
+                ],
+                billed_payments,
+            )
+            db.commit()
+        except Exception as e:
+            logger.exception(f"Error processing EMI payment batch: {str(e)}")
+            db.rollback()
+            for index, _, _ in applied:
+                results[index] = {'emi_id': payments[index]['emi_id'], 'success': False, 'message': "Failed to process payment", 'data': {}}
+            return CollectionService._fill_repeats(payments, results, repeats)
+
+        report_cache.invalidate_loans({emi.loan_id for _, emi, _ in applied})
+        for index, result in applied_results.items():
+            results[index] = result
+
+        logger.info(f"Processed {len(applied)} of {len(payments)} EMI payments in one transaction")
+        return CollectionService._fill_repeats(payments, results, repeats)
+
+    @staticmethod
+    def _fill_repeats(payments: list, results: list, repeats: list) -> list:
+        """Give payments that repeat an idempotency key used earlier in the same batch the result of that payment"""
+        for index, owner in repeats:
+            emi_id = payments[index]['emi_id']
+            if emi_id != payments[owner]['emi_id']:
+                results[index] = {'emi_id': emi_id, 'success': False, 'message': "Idempotency-Key was already used for another payment", 'data': {}}
+            else:
+                results[index] = dict(results[owner])
+        return results
+
+
+if __name__ == "__main__":
+    # python -m services.collection_service
+    from database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    PaymentIdempotencyKey.__table__.create(bind=engine, checkfirst=True)
+    logger.info("Created payment_idempotency_keys table")
+
+    # Indexes behind the due collections route sheet
+    indexes = [
+        index
+        for table in (LoanMemberEmi.__table__, Loan.__table__)
+        for index in table.indexes
+        if index.name in ("ix_loan_member_emi_date_status", "ix_loans_assign_to")
+    ]
+    for index in indexes:
+        index.create(bind=engine, checkfirst=True)
+        logger.info(f"Created index {index.name}")
@@ -0,0 +1,110 @@
+from typing import NamedTuple, Optional
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Emu
+from docx.table import Table
+from xml.sax.saxutils import escape
+import re
+
+
+class CellFormat(NamedTuple):
+    """Formatting of a table cell; size is in points, align is left, center or right"""
+    bold: bool = False
+    color: Optional[str] = None
+    size: Optional[float] = None
+    align: Optional[str] = None
+    fill: Optional[str] = None
+
+
+PLAIN = CellFormat()
+
+_CONTROL_CHARS = re.compile(r"([\t\r\n])")
+
+
+class DocxTableWriter:
+    """
+    Build a Word table as WordprocessingML text and parse it once, instead of creating
+    python-docx cell, paragraph and run objects and walking their runs for every cell.
+    Each distinct CellFormat is rendered into a cell template the first time it is used.
+    """
+
+    def __init__(self, doc, cols: int, style: str = "Light Grid Accent 1", fixed_layout: bool = False):
+        # The body-level sectPr is the last section; doc.sections would scan the whole body for every table
+        sect_pr = doc.element.body.sectPr
+        block_width = sect_pr.page_width - sect_pr.left_margin - sect_pr.right_margin
+        self._doc = doc
+        self._cols = cols
+        self._col_width = Emu(block_width / cols).twips
+        self._style_id = doc.styles[style].style_id if style else None
+        self._fixed_layout = fixed_layout
+        self._templates = {}
+        self._rows = []
+
+    def _template(self, fmt: CellFormat) -> tuple:
+        """Get the markup before and after the run text of a cell with the given format"""
+        template = self._templates.get(fmt)
+        if template is None:
+            shd = f'<w:shd w:fill="{fmt.fill}"/>' if fmt.fill else ""
+            ppr = f'<w:pPr><w:jc w:val="{fmt.align}"/></w:pPr>' if fmt.align else ""
+            rpr = ""
+            if fmt.bold:
+                rpr += "<w:b/>"
+            if fmt.color:
+                rpr += f'<w:color w:val="{fmt.color}"/>'
+            if fmt.size:
+                rpr += f'<w:sz w:val="{int(fmt.size * 2)}"/>'
+            if rpr:
+                rpr = f"<w:rPr>{rpr}</w:rPr>"
+            template = (
+                f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{self._col_width}"/>{shd}</w:tcPr>'
+                f"<w:p>{ppr}<w:r>{rpr}",
+                "</w:r></w:p></w:tc>",
+            )
+            self._templates[fmt] = template
+        return template
+
+    @staticmethod
+    def _text_xml(text: str) -> str:
+        """Render run text the way python-docx does: tabs and line breaks become w:tab and w:br"""
+        if "\t" not in text and "\n" not in text and "\r" not in text:
+            return f'<w:t xml:space="preserve">{escape(text)}</w:t>' if text else ""
+
+        parts = []
+        for part in _CONTROL_CHARS.split(text):
+            if part == "\t":
+                parts.append("<w:tab/>")
+            elif part in ("\r", "\n"):
+                parts.append("<w:br/>")
+            elif part:
+                parts.append(f'<w:t xml:space="preserve">{escape(part)}</w:t>')
+        return "".join(parts)
+
+    def add_row(self, values: list, formats=PLAIN):
+        """Append a row of cell texts; formats is one CellFormat for the whole row or a list with one per cell"""
+        cells = []
+        for i, value in enumerate(values):
+            fmt = formats if isinstance(formats, CellFormat) else formats[i]
+            before, after = self._template(fmt)
+            cells.append(before + self._text_xml(str(value)) + after)
+        for _ in range(len(values), self._cols):
+            before, after = self._template(PLAIN)
+            cells.append(before + after)
+        self._rows.append("<w:tr>" + "".join(cells) + "</w:tr>")
+
+    def finish(self) -> Table:
+        """Append the table to the end of the document body and return it"""
+        style = f'<w:tblStyle w:val="{self._style_id}"/>' if self._style_id else ""
+        layout = '<w:tblLayout w:type="fixed"/>' if self._fixed_layout else ""
+        grid = "".join(f'<w:gridCol w:w="{self._col_width}"/>' for _ in range(self._cols))
+        tbl = parse_xml(
+            f"<w:tbl {nsdecls('w')}>"
+            f'<w:tblPr>{style}<w:tblW w:type="auto" w:w="0"/>{layout}'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+            'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+            f"<w:tblGrid>{grid}</w:tblGrid>"
+            + "".join(self._rows)
+            + "</w:tbl>"
+        )
+        self._rows = []
+        self._doc.element.body._insert_tbl(tbl)
+        return Table(tbl, self._doc._body)
@@ -0,0 +1,36 @@
+from docx import Document
+from typing import Callable, Optional
+import copy
+import threading
+
+
+class DocxTemplate:
+    """
+    Base Word document that is built once per process and cloned for every export.
+    Document() unzips and parses python-docx's default template each time it is called. A clone
+    deep-copies only the main document part and shares the styles, numbering, settings, theme and
+    other parts with the base, so documents made from a template must not modify those parts.
+    """
+
+    def __init__(self, prepare: Optional[Callable] = None):
+        self._prepare = prepare
+        self._base = None
+        self._shared_parts = ()
+        self._lock = threading.Lock()
+
+    def _get_base(self):
+        """Build the base document on first use"""
+        with self._lock:
+            if self._base is None:
+                doc = Document()
+                if self._prepare is not None:
+                    self._prepare(doc)
+                self._shared_parts = [part for part in doc.part.package.iter_parts() if part is not doc.part]
+                self._base = doc
+            return self._base
+
+    def new_document(self):
+        """Get a new document with the base document's content and section settings"""
+        base = self._get_base()
+        memo = {id(part): part for part in self._shared_parts}
+        return copy.deepcopy(base, memo)
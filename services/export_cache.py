@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from config import settings
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ExportArtifactCache:
+    """
+    Size-bounded on-disk LRU cache of rendered export files, keyed by content address.
+    The key covers everything the artifact depends on, so entries never need invalidating:
+    changed data produces a new key and the stale entries age out of the LRU.
+    Each process keeps its own recency index; files evicted by another process count as misses.
+    The cache stays disabled until init() is called, so worker processes that import it never
+    scan or evict the cache directory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._initialized = False
+
+    def init(self):
+        """Create the cache directory and index the files left by earlier runs; safe to call more than once"""
+        with self._lock:
+            if self._initialized or self.max_bytes <= 0:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+            self._initialized = True
+
+    @staticmethod
+    def make_key(report_type: str, file_format: str, filters: tuple, data_version: str, as_of) -> str:
+        """Build the content address of an export from its report, format, normalized filters and data version"""
+        raw = json.dumps([report_type, file_format, filters, data_version, as_of], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _load_index(self):
+        """Index the files left by earlier runs, least recently used first; call with the lock held"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = self._path(name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used files until the cache fits in max_bytes; call with the lock held"""
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def open(self, key: str):
+        """Open the cached artifact for key for reading, or return None on a miss"""
+        if not self._initialized:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                try:
+                    f = open(self._path(key), "rb")
+                except FileNotFoundError:
+                    self._size -= self._entries.pop(key)
+                else:
+                    self._entries.move_to_end(key)
+                    os.utime(f.fileno())
+                    self.hits += 1
+                    return f
+            self.misses += 1
+            return None
+
+    def put(self, key: str, source):
+        """Store the rest of the readable binary file source under key; source is rewound to where it was"""
+        if not self._initialized:
+            return
+
+        start = source.tell()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(source, f)
+                size = f.tell()
+            if size > self.max_bytes:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not cache export artifact {key}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        finally:
+            source.seek(start)
+
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def stats(self) -> dict:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+            }
+
+
+export_cache = ExportArtifactCache(
+    cache_dir=settings.EXPORT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "vgreen-export-cache"),
+    max_bytes=settings.EXPORT_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from config import settings
+from database import SessionLocal
+from services.export_service import ExportService, EXPORT_REPORTS
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+# Report filters accepted by export jobs; the dates are stored as ISO strings
+JOB_FILTERS = ("start_date", "end_date", "emi_days", "member_ids", "group_ids", "staff_ids", "loan_ids")
+DATE_FILTERS = ("start_date", "end_date")
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def _pid_alive(pid) -> bool:
+    """Check whether a process with the given pid is still running"""
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+class ExportJobService:
+    """
+    Runs Word exports on a bounded worker pool, away from the request threads.
+    Each job's state is kept as <job_id>.json next to its <job_id>.docx artifact in job_dir, so
+    any API worker process can answer status and download requests for it.
+    Finished jobs and their artifacts are removed ttl_seconds after they finish.
+    """
+
+    def __init__(self, job_dir: str, max_workers: int = 2, ttl_seconds: int = 3600):
+        self.job_dir = job_dir
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export-job")
+        self._lock = threading.Lock()
+        os.makedirs(job_dir, exist_ok=True)
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def artifact_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.docx")
+
+    def _write_state(self, job: dict):
+        """Replace the job state file atomically so readers never see a partial write"""
+        path = self._state_path(job["id"])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _update(self, job: dict, **changes):
+        with self._lock:
+            job.update(changes)
+            job["updated_at"] = datetime.now().isoformat()
+            self._write_state(job)
+
+    def create_job(self, report_type: str, filters: dict) -> dict:
+        """Queue an export of report_type with the given report filters and return its state"""
+        if report_type not in EXPORT_REPORTS:
+            raise ValueError(f"Invalid report_type. Use {', '.join(EXPORT_REPORTS)}")
+
+        self.prune_expired()
+
+        now = datetime.now().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "report_type": report_type,
+            "filters": {
+                name: value.isoformat() if isinstance(value, date) else value
+                for name, value in filters.items()
+                if name in JOB_FILTERS and value is not None
+            },
+            "status": JOB_QUEUED,
+            "stage": "queued",
+            "progress": 0.0,
+            "error": None,
+            "filename": None,
+            "size": None,
+            "pid": os.getpid(),
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._write_state(job)
+            created = dict(job)
+        self._executor.submit(self._run, job)
+        return created
+
+    def get_job(self, job_id: str):
+        """Get the state of a job, or None when it does not exist or has expired"""
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                job = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # A job left unfinished by a process that is gone will never complete
+        if job["status"] not in FINISHED_STATUSES and job["pid"] != os.getpid() and not _pid_alive(job["pid"]):
+            self._update(job, status=JOB_FAILED, stage="failed", error="Export was interrupted",
+                         finished_at=datetime.now().isoformat())
+        return job
+
+    def _run(self, job: dict):
+        """Fetch the report data and render the artifact, recording progress on the job"""
+        report = EXPORT_REPORTS[job["report_type"]]
+        filters = {
+            name: date.fromisoformat(value) if name in DATE_FILTERS else value
+            for name, value in job["filters"].items()
+        }
+        artifact_path = self.artifact_path(job["id"])
+        tmp_path = f"{artifact_path}.tmp"
+        db = SessionLocal()
+        try:
+            self._update(job, status=JOB_RUNNING, stage="rendering", progress=0.1)
+            with ExportService.render_report(db, job["report_type"], filters) as rendered:
+                self._update(job, stage="saving", progress=0.8)
+                with open(tmp_path, "wb") as f:
+                    shutil.copyfileobj(rendered, f)
+            os.replace(tmp_path, artifact_path)
+
+            self._update(
+                job,
+                status=JOB_COMPLETED,
+                stage="completed",
+                progress=1.0,
+                filename=f"{report.filename_prefix}_{date.today()}.docx",
+                size=os.path.getsize(artifact_path),
+                finished_at=datetime.now().isoformat(),
+            )
+        except Exception as e:
+            logger.exception(f"Export job {job['id']} failed: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._update(job, status=JOB_FAILED, stage="failed", error=str(e),
+                         finished_at=datetime.now().isoformat())
+        finally:
+            db.close()
+
+    def prune_expired(self):
+        """Remove finished jobs, and their artifacts, older than ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.job_dir):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            job = self.get_job(job_id)
+            if job is None or job["status"] not in FINISHED_STATUSES:
+                continue
+            if datetime.fromisoformat(job["finished_at"]).timestamp() > cutoff:
+                continue
+            for path in (self.artifact_path(job_id), self._state_path(job_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+export_jobs = ExportJobService(
+    job_dir=settings.EXPORT_JOB_DIR or os.path.join(tempfile.gettempdir(), "vgreen-export-jobs"),
+    max_workers=settings.EXPORT_JOB_WORKERS,
+    ttl_seconds=settings.EXPORT_JOB_TTL_SECONDS,
+)
@@ -1,104 +1,324 @@
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
+from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-from datetime import datetime
+from docx.oxml import parse_xml
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from config import settings
+from services.reports_service import ReportsService, REPORT_SECTIONS
+from services.report_cache import ReportCache
+from services.export_cache import export_cache
+from services.docx_table_writer import DocxTableWriter, CellFormat, PLAIN
+from services.docx_template import DocxTemplate
+from services.xlsx_stream_writer import iter_xlsx
+from services.zip_stream import iter_zip
+from typing import Callable, NamedTuple
+import csv
+import io
 import logging
+import multiprocessing
+import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
+HEADER_FORMAT = CellFormat(bold=True, color="FFFFFF", align="center", fill="0070C0")
+NUMERIC_FORMAT = CellFormat(align="right")
+
+# Collections summary page tables
+LOAN_HEADER_FORMAT = CellFormat(bold=True, size=10, align="left")
+USER_HEADER_FORMAT = CellFormat(bold=True, color="FFFFFF", size=9, align="center", fill="0070C0")
+USER_ROW_FORMATS = [CellFormat(size=8, align="left")] * 2 + [CellFormat(size=8, align="center")] * 10
+TOTAL_ROW_FORMATS = (
+    [CellFormat(bold=True, size=8, align="left")] + [PLAIN] * 7 + [CellFormat(bold=True, size=8, align="center")] * 4
+)
+SIGNATURE_FORMAT = CellFormat(size=9, align="center")
+
+
+def _set_landscape(doc):
+    """Set document to landscape orientation with half-inch margins"""
+    section = doc.sections[0]
+    section.page_height = Inches(8.5)
+    section.page_width = Inches(11)
+    section.left_margin = Inches(0.5)
+    section.right_margin = Inches(0.5)
+    section.top_margin = Inches(0.5)
+    section.bottom_margin = Inches(0.5)
+
+
+# Base documents of the Word exports, built once per process
+REPORT_TEMPLATE = DocxTemplate()
+COLLECTIONS_TEMPLATE = DocxTemplate(_set_landscape)
+
+# Process pool for collections summary pages, started on the first parallel export
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+# Rows written to the CSV buffer before it is flushed to the response
+CSV_FLUSH_ROWS = 500
+
+# Bytes read at a time from a rendered Word document into a ZIP bundle
+BUNDLE_CHUNK_SIZE = 64 * 1024
+
+
+class ExportColumn(NamedTuple):
+    """A report row field exported as a column; money columns are shown as ₹ amounts in Word"""
+    header: str
+    key: str
+    money: bool = False
+    default: object = ''
+
+
+# Columns of each report section, shared by the Word and spreadsheet exports
+SECTION_COLUMNS = {
+    "metrics": [
+        ExportColumn('Metric', 'metric'),
+        ExportColumn('Value', 'value'),
+    ],
+    "summary": [
+        ExportColumn('Loan ID', 'loanId'),
+        ExportColumn('Group Name', 'groupName'),
+        ExportColumn('Loan Amount (₹)', 'loanAmountValue', money=True),
+        ExportColumn('Collected (₹)', 'collectedAmount', money=True),
+        ExportColumn('Pending (₹)', 'pendingAmount', money=True),
+        ExportColumn('EMI Day', 'emiDay'),
+        ExportColumn('Status', 'status'),
+    ],
+    "user": [
+        ExportColumn('User Name', 'userName'),
+        ExportColumn('Loan ID', 'loanId'),
+        ExportColumn('Group Name', 'groupName'),
+        ExportColumn('Total EMI (₹)', 'totalEmi', money=True),
+        ExportColumn('Paid EMI (₹)', 'paidEmi', money=True),
+        ExportColumn('Pending EMI (₹)', 'pendingEmi', money=True),
+    ],
+    "emi": [
+        ExportColumn('Loan ID', 'loanId'),
+        ExportColumn('User Name', 'userName'),
+        ExportColumn('Total EMIs', 'totalEmis', default=0),
+        ExportColumn('Paid EMIs', 'paidEmis', default=0),
+        ExportColumn('Pending EMIs', 'pendingEmis', default=0),
+    ],
+    "emi_details": [
+        ExportColumn('EMI Date', 'emiDate'),
+        ExportColumn('EMI Amount (₹)', 'emiAmount', money=True),
+        ExportColumn('Status', 'emiStatus'),
+    ],
+    "collections": [
+        ExportColumn('Loan Number', 'loanId'),
+        ExportColumn('Group Name', 'groupName'),
+        ExportColumn('Loan Amount (₹)', 'loanAmountValue', money=True),
+        ExportColumn('Collected Amount (₹)', 'collectedAmount', money=True),
+        ExportColumn('Pending Amount (₹)', 'pendingAmount', money=True),
+        ExportColumn('Next EMI Date', 'nextEmiDate'),
+        ExportColumn('Next EMI Amount (₹)', 'nextEmiAmount', money=True),
+    ],
+}
+
+# Sections that can be exported as CSV or XLSX, and the spreadsheet formats
+SPREADSHEET_SECTIONS = ("metrics", "summary", "user", "emi", "collections")
+SPREADSHEET_FORMATS = ("csv", "xlsx")
+
 
 class ExportService:
     @staticmethod
-    def _set_cell_background(cell, fill):
-        """Set cell background color"""
-        shading_elm = OxmlElement('w:shd')
-        shading_elm.set(qn('w:fill'), fill)
-        cell._element.get_or_add_tcPr().append(shading_elm)
+    def _column_value(item: dict, column: ExportColumn):
+        """Get a column's value from a report row; money columns are always numeric"""
+        value = item.get(column.key, 0 if column.money else column.default)
+        # loanAmount is a string like "principal + interest", loanAmountValue is the number
+        if column.money and not isinstance(value, (int, float)):
+            value = 0
+        return value
+
+    @staticmethod
+    def _word_row(item: dict, columns: list) -> list:
+        """Get the Word table cells of a report row"""
+        cells = []
+        for column in columns:
+            value = ExportService._column_value(item, column)
+            cells.append(f"₹{float(value):,.2f}" if column.money else value)
+        return cells
+
+    @staticmethod
+    def _section_table(doc, title, section, items):
+        """Add a Word table of a report section's rows using its SECTION_COLUMNS"""
+        columns = SECTION_COLUMNS[section]
+        ExportService._add_table_to_document(
+            doc,
+            title,
+            [column.header for column in columns],
+            [ExportService._word_row(item, columns) for item in items],
+        )
 
     @staticmethod
     def _add_table_to_document(doc, title, columns, rows):
         """Add a table to the document with proper formatting"""
         doc.add_heading(title, level=2)
         
-        table = doc.add_table(rows=1, cols=len(columns))
-        table.style = 'Light Grid Accent 1'
+        table = DocxTableWriter(doc, len(columns))
+        table.add_row(columns, HEADER_FORMAT)
         
-        # Add header row
-        header_cells = table.rows[0].cells
-        for i, col in enumerate(columns):
-            header_cells[i].text = col
-            # Style header
-            for paragraph in header_cells[i].paragraphs:
-                for run in paragraph.runs:
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(255, 255, 255)
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            ExportService._set_cell_background(header_cells[i], '0070C0')
-        
-        # Add data rows
+        # Add data rows, aligning numeric columns right
         for row_data in rows:
-            row_cells = table.add_row().cells
-            for i, value in enumerate(row_data):
-                row_cells[i].text = str(value)
-                # Align right for numeric columns
-                for paragraph in row_cells[i].paragraphs:
-                    if i > 0 and isinstance(value, (int, float)):
-                        paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+            table.add_row(row_data, [
+                NUMERIC_FORMAT if i > 0 and isinstance(value, (int, float)) else PLAIN
+                for i, value in enumerate(row_data)
+            ])
         
+        table.finish()
         doc.add_paragraph()  # Add spacing
 
+    @staticmethod
+    def _sheet_rows(items, columns: list):
+        """Get the spreadsheet cells of report rows; money stays numeric"""
+        for item in items:
+            yield [ExportService._column_value(item, column) for column in columns]
+
+    @staticmethod
+    def iter_csv(section: str, items):
+        """Yield a CSV of report rows as UTF-8 bytes chunks, with a BOM so Excel reads the ₹ headers"""
+        columns = SECTION_COLUMNS[section]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.header for column in columns])
+        yield "\ufeff".encode() + buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+        for count, row in enumerate(ExportService._sheet_rows(items, columns), 1):
+            writer.writerow(row)
+            if count % CSV_FLUSH_ROWS == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def iter_xlsx(section: str, items):
+        """Yield an XLSX workbook of report rows as bytes chunks"""
+        columns = SECTION_COLUMNS[section]
+        return iter_xlsx(
+            section.capitalize(),
+            [column.header for column in columns],
+            ExportService._sheet_rows(items, columns),
+        )
+
+    @staticmethod
+    def render_report(db, report_type: str, filters: dict):
+        """
+        Get the Word export of a report in EXPORT_REPORTS for the given filters as an open binary file,
+        positioned at the start. It is served from the export artifact cache while the report data is unchanged.
+        """
+        report = EXPORT_REPORTS[report_type]
+        cache_key = export_cache.make_key(
+            report_type,
+            "docx",
+            ReportCache.make_key(**filters),
+            ReportsService.get_data_version(db, **filters),
+            # Overdue and next EMI figures and the "Generated on" stamp depend on the current date
+            date.today(),
+        )
+        cached = export_cache.open(cache_key)
+        if cached is not None:
+            return cached
+
+        # Build from the database, not report_cache, so the artifact matches the data version in its key
+        data = ReportsService.get_reports_data(
+            db,
+            sections=list(report.sections),
+            include_details=report.include_details,
+            use_cache=False,
+            **filters,
+        )
+        # get_reports_data logs its own errors and falls back to an empty result
+        if any(REPORT_SECTIONS[section] not in data for section in report.sections):
+            raise RuntimeError("Failed to fetch report data")
+
+        spool = ExportService.save_to_spool(report.render(data))
+        export_cache.put(cache_key, spool)
+        return spool
+
+    @staticmethod
+    def metric_rows(metrics: dict):
+        """Get the metrics section as Metric/Value rows"""
+        return [{"metric": metric, "value": value} for metric, value in metrics.items()]
+
+    @staticmethod
+    def spreadsheet_filename(section: str, file_format: str) -> str:
+        return f"{section.capitalize()}_Report_{date.today()}.{file_format}"
+
+    @staticmethod
+    def iter_bundle(data: dict, reports: list, sections: list, formats: list):
+        """
+        Yield a ZIP of the Word exports of the given EXPORT_REPORTS and the spreadsheets of the given
+        sections in each format, all rendered from one get_reports_data result. Each file is
+        rendered only when the previous one has been written, so the archive streams file by file.
+        """
+        def entries():
+            for report_type in reports:
+                report = EXPORT_REPORTS[report_type]
+                spool = ExportService.save_to_spool(report.render(data))
+                with spool:
+                    yield (
+                        f"{report.filename_prefix}_{date.today()}.docx",
+                        iter(lambda: spool.read(BUNDLE_CHUNK_SIZE), b""),
+                    )
+
+            for section in sections:
+                items = data[REPORT_SECTIONS[section]]
+                if section == "metrics":
+                    items = ExportService.metric_rows(items)
+                for file_format in formats:
+                    if file_format == "csv":
+                        chunks = ExportService.iter_csv(section, items)
+                    else:
+                        chunks = ExportService.iter_xlsx(section, items)
+                    yield ExportService.spreadsheet_filename(section, file_format), chunks
+
+        return iter_zip(entries())
+
+    @staticmethod
+    def save_to_spool(doc):
+        """
+        Save a document into an anonymous spooled temp file that stays in memory up to
+        EXPORT_SPOOL_MAX_BYTES. Returns the file rewound to the start; closing it discards the data.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+        try:
+            doc.save(spool)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
     @staticmethod
     def export_financial_summary(summary_data, metrics):
         """Export Financial Summary table to Word document"""
         try:
-            doc = Document()
+            doc = REPORT_TEMPLATE.new_document()
             
             # Add title and metadata
             title = doc.add_heading('Financial Summary Report', 0)
             title.alignment = WD_ALIGN_PARAGRAPH.CENTER
             
-            doc.add_paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+            doc.add_paragraph(f'Generated on: {date.today().isoformat()}')
             doc.add_paragraph()
             
             # Add metrics summary
             doc.add_heading('Key Metrics', level=1)
-            metrics_table = doc.add_table(rows=1, cols=2)
-            metrics_table.style = 'Light Grid Accent 1'
-            
-            header_cells = metrics_table.rows[0].cells
-            header_cells[0].text = 'Metric'
-            header_cells[1].text = 'Value'
-            
+            metrics_table = DocxTableWriter(doc, 2)
+            metrics_table.add_row(['Metric', 'Value'])
             for key, value in metrics.items():
-                row_cells = metrics_table.add_row().cells
-                row_cells[0].text = key
-                row_cells[1].text = str(value)
+                metrics_table.add_row([key, value])
+            metrics_table.finish()
             
             doc.add_paragraph()
             
             # Add financial summary table
-            columns = ['Loan ID', 'Group Name', 'Loan Amount (₹)', 'Collected (₹)', 'Pending (₹)', 'EMI Day', 'Status']
-            rows = []
-            
-            for item in summary_data:
-                # loanAmount is now a string like "principal + interest", use loanAmountValue for numeric
-                loan_amt = item.get('loanAmountValue', 0)
-                if isinstance(loan_amt, str):
-                    loan_amt = 0
-                
-                rows.append([
-                    item.get('loanId', ''),
-                    item.get('groupName', ''),
-                    f"₹{float(loan_amt):,.2f}",
-                    f"₹{item.get('collectedAmount', 0):,.2f}",
-                    f"₹{item.get('pendingAmount', 0):,.2f}",
-                    item.get('emiDay', ''),
-                    item.get('status', ''),
-                ])
-            
-            ExportService._add_table_to_document(doc, 'Financial Summary', columns, rows)
+            ExportService._section_table(doc, 'Financial Summary', 'summary', summary_data)
             
             return doc
         except Exception as e:
@@ -109,30 +329,17 @@ class ExportService:
     def export_user_summary(user_summary_data):
         """Export User Summary table to Word document"""
         try:
-            doc = Document()
+            doc = REPORT_TEMPLATE.new_document()
             
             # Add title and metadata
             title = doc.add_heading('User Summary Report', 0)
             title.alignment = WD_ALIGN_PARAGRAPH.CENTER
             
-            doc.add_paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+            doc.add_paragraph(f'Generated on: {date.today().isoformat()}')
             doc.add_paragraph()
             
             # Add user summary table
-            columns = ['User Name', 'Loan ID', 'Group Name', 'Total EMI (₹)', 'Paid EMI (₹)', 'Pending EMI (₹)']
-            rows = []
-            
-            for item in user_summary_data:
-                rows.append([
-                    item.get('userName', ''),
-                    item.get('loanId', ''),
-                    item.get('groupName', ''),
-                    f"₹{item.get('totalEmi', 0):,.2f}",
-                    f"₹{item.get('paidEmi', 0):,.2f}",
-                    f"₹{item.get('pendingEmi', 0):,.2f}",
-                ])
-            
-            ExportService._add_table_to_document(doc, 'User Summary', columns, rows)
+            ExportService._section_table(doc, 'User Summary', 'user', user_summary_data)
             
             return doc
         except Exception as e:
@@ -143,29 +350,17 @@ class ExportService:
     def export_emi_summary(emi_summary_data):
         """Export EMI Summary table with details to Word document"""
         try:
-            doc = Document()
+            doc = REPORT_TEMPLATE.new_document()
             
             # Add title and metadata
             title = doc.add_heading('EMI Summary Report', 0)
             title.alignment = WD_ALIGN_PARAGRAPH.CENTER
             
-            doc.add_paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+            doc.add_paragraph(f'Generated on: {date.today().isoformat()}')
             doc.add_paragraph()
             
             # Add EMI summary table
-            columns = ['Loan ID', 'User Name', 'Total EMIs', 'Paid EMIs', 'Pending EMIs']
-            rows = []
-            
-            for item in emi_summary_data:
-                rows.append([
-                    item.get('loanId', ''),
-                    item.get('userName', ''),
-                    item.get('totalEmis', 0),
-                    item.get('paidEmis', 0),
-                    item.get('pendingEmis', 0),
-                ])
-            
-            ExportService._add_table_to_document(doc, 'EMI Summary', columns, rows)
+            ExportService._section_table(doc, 'EMI Summary', 'emi', emi_summary_data)
             
             # Add detailed EMI information
             doc.add_heading('EMI Details', level=1)
@@ -175,17 +370,7 @@ class ExportService:
                 
                 emi_details = item.get('emiDetails', [])
                 if emi_details:
-                    detail_columns = ['EMI Date', 'EMI Amount (₹)', 'Status']
-                    detail_rows = []
-                    
-                    for emi in emi_details:
-                        detail_rows.append([
-                            emi.get('emiDate', ''),
-                            f"₹{emi.get('emiAmount', 0):,.2f}",
-                            emi.get('emiStatus', ''),
-                        ])
-                    
-                    ExportService._add_table_to_document(doc, f"EMI Details for {item.get('loanId')}", detail_columns, detail_rows)
+                    ExportService._section_table(doc, f"EMI Details for {item.get('loanId')}", 'emi_details', emi_details)
             
             return doc
         except Exception as e:
@@ -193,212 +378,224 @@ class ExportService:
             raise
 
     @staticmethod
-    def export_collections_summary(collections_summary_data):
-        """Export Collections Summary table with detailed user information to Word document"""
-        try:
-            doc = Document()
-            
-            # Set document to landscape orientation
-            section = doc.sections[0]
-            section.page_height = Inches(8.5)
-            section.page_width = Inches(11)
-            section.left_margin = Inches(0.5)
-            section.right_margin = Inches(0.5)
-            section.top_margin = Inches(0.5)
-            section.bottom_margin = Inches(0.5)
-         
-            # Add collections summary table
-            columns = ['Loan Number', 'Group Name', 'Loan Amount (₹)', 'Collected Amount (₹)', 'Pending Amount (₹)', 'Next EMI Date', 'Next EMI Amount (₹)']
-            rows = []
-            
-            for item in collections_summary_data:
-                # loanAmount is now a string like "principal + interest", use loanAmountValue for numeric
-                loan_amt = item.get('loanAmountValue', 0)
-                if isinstance(loan_amt, str):
-                    loan_amt = 0
+    def _add_collection_pages(doc, collections_summary_data, generated_on: str, first_loan: bool = True):
+        """Add one page per loan with user details; first_loan False starts with a page break"""
+        for item in collections_summary_data:
+            user_details = item.get('userDetails', [])
+            if user_details:
+                # Add page break before each loan (except the first)
+                if not first_loan:
+                    doc.add_page_break()
+                first_loan = False
                 
-                rows.append([
-                    item.get('loanId', ''),
-                    item.get('groupName', ''),
-                    f"₹{float(loan_amt):,.2f}",
-                    f"₹{item.get('collectedAmount', 0):,.2f}",
-                    f"₹{item.get('pendingAmount', 0):,.2f}",
-                    item.get('nextEmiDate', ''),
-                    f"₹{item.get('nextEmiAmount', 0):,.2f}",
-                ])
-            
-            #ExportService._add_table_to_document(doc, 'Collections Summary', columns, rows)
-            
-            first_loan = True
-            for item in collections_summary_data:
-                user_details = item.get('userDetails', [])
-                if user_details:
-                    # Add page break before each loan (except the first)
-                    if not first_loan:
-                        doc.add_page_break()
-                    first_loan = False
-                    
-                    # Add title and generated date to each page
-                    title = doc.add_heading('Collections Summary Report', 0)
-                    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    
-                    doc.add_paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
-                    doc.add_paragraph()
-                    
-                    # Add loan header info table
-                    header_table = doc.add_table(rows=2, cols=2)
-                    header_table.style = 'Light Grid Accent 1'
-                    
-                    # Row 1: Loan ID and Group Name
-                    header_table.rows[0].cells[0].text = f"Loan ID: {item.get('loanId', 'N/A')}"
-                    header_table.rows[0].cells[1].text = f"Group Name: {item.get('groupName', 'N/A')}"
-                    
-                    # Row 2: EMI Day and Collection Date
-                    header_table.rows[1].cells[0].text = f"EMI Day: {item.get('emiDay', 'N/A')}"
-                    header_table.rows[1].cells[1].text = f"Collection Date: {item.get('collectionDate', 'N/A')}"
-                    
-                    # Format header table
-                    for row in header_table.rows:
-                        for cell in row.cells:
-                            for paragraph in cell.paragraphs:
-                                for run in paragraph.runs:
-                                    run.font.size = Pt(10)
-                                    run.font.bold = True
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    
-                    doc.add_paragraph()  # Add spacing
-                    
-                    # Create table with users and their details
-                    # Columns: Member, Mobile, LA, Paid, Pending, EMI Adv, No EMI, No Paid, No Overdue, OD amt, Loan Adv, EMI amt
-                    columns = ['Member', 'Mobile', 'LA', 'Paid', 'Pending', 'EMI Adv', 'No EMI', 'No Paid', 'No OD', 'OD Amt', 'Loan Adv', 'EMI Amt']
-                    
-                    user_table = doc.add_table(rows=1, cols=len(columns))
-                    user_table.style = 'Light Grid Accent 1'
-                    user_table.autofit = False
-                    user_table.allow_autofit = False
-                    
-                    # Set table width to full page
-                    table_width = Inches(10)
-                    user_table.width = table_width
-                    
-                    # Add header row
-                    header_cells = user_table.rows[0].cells
-                    for i, col in enumerate(columns):
-                        header_cells[i].text = col
-                        # Style header with smaller font
-                        for paragraph in header_cells[i].paragraphs:
-                            for run in paragraph.runs:
-                                run.font.bold = True
-                                run.font.size = Pt(9)
-                                run.font.color.rgb = RGBColor(255, 255, 255)
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        ExportService._set_cell_background(header_cells[i], '0070C0')
-                    
-                    # Calculate totals for this loan
-                    total_no_od = 0
-                    total_od_amt = 0
-                    total_loan_adv = 0
-                    total_emi_amt = 0
-                    
-                    # Add user rows
-                    for user in user_details:
-                        row_cells = user_table.add_row().cells
-                        
-                        # Set cell values (without ₹ symbols)
-                        row_cells[0].text = user.get('userName', 'N/A')
-                        row_cells[1].text = user.get('mobileNumber', 'N/A')
-                        row_cells[2].text = f"{user.get('loanAmount', 0):,.0f}"
-                        row_cells[3].text = f"{user.get('collectedAmount', 0):,.0f}"
-                        row_cells[4].text = f"{user.get('pendingAmount', 0):,.0f}"
-                        row_cells[5].text = f"{user.get('loanAdvance', 0):,.0f}"  # EMI Adv = loan member advance
-                        row_cells[6].text = str(user.get('totalEmis', 0))
-                        row_cells[7].text = str(user.get('paidEmis', 0))
-                        row_cells[8].text = str(user.get('overdueEmis', 0))  # No OD = count of EMIs with date < today
-                        row_cells[9].text = f"{user.get('totalOverdueAmount', 0):,.0f}"  # OD Amt = sum of EMI amounts with date < today
-                        row_cells[10].text = "100"  # Loan Adv = loan member advance
-                        row_cells[11].text = f"{user.get('emiAmount', 0):,.0f}"
-                        
-                        # Accumulate totals
-                        total_no_od += user.get('overdueEmis', 0)
-                        total_od_amt += user.get('totalOverdueAmount', 0)
-                        total_loan_adv += 100  # Loan Adv is fixed at 100
-                        total_emi_amt += user.get('emiAmount', 0)
-                        
-                        # Format all cells with smaller font and proper alignment
-                        for i, cell in enumerate(row_cells):
-                            for paragraph in cell.paragraphs:
-                                for run in paragraph.runs:
-                                    run.font.size = Pt(8)
-                                # Align numeric columns to right, text columns to left
-                                if i == 0 or i == 1:
-                                    paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                                else:
-                                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    
-                    # Add total row
-                    total_row_cells = user_table.add_row().cells
-                    total_row_cells[0].text = "Total Amount"
-                    
-                    # Make "Total Amount" bold and span across Member to No Paid columns (0-7)
-                    for i in range(8):
-                        if i > 0:
-                            total_row_cells[i].text = ""
-                    
-                    # Format total row header
-                    for paragraph in total_row_cells[0].paragraphs:
-                        for run in paragraph.runs:
-                            run.font.bold = True
-                            run.font.size = Pt(8)
-                        paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    
-                    # Add totals for No OD, OD Amt, Loan Adv, EMI Amt
-                    total_row_cells[8].text = str(total_no_od)
-                    total_row_cells[9].text = f"{total_od_amt:,.0f}"
-                    total_row_cells[10].text = f"{total_loan_adv:,.0f}"
-                    total_row_cells[11].text = f"{total_emi_amt:,.0f}"
-                    
-                    # Format total row cells
-                    for i in range(8, 12):
-                        for paragraph in total_row_cells[i].paragraphs:
-                            for run in paragraph.runs:
-                                run.font.bold = True
-                                run.font.size = Pt(8)
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    
-                    doc.add_paragraph()  # Add spacing
-                    
-                    # Add summary values below table
-                    summary_para = doc.add_paragraph()
-                    summary_para.add_run(f"Total EMI Amount Collection: {total_emi_amt:,.0f}\n")
-                    summary_para.add_run(f"Total Advance Collection: {total_loan_adv:,.0f}\n")
-                    summary_para.add_run(f"Total Over Due Collection: {total_od_amt:,.0f}")
-                    
-                    for run in summary_para.runs:
-                        run.font.size = Pt(9)
-                    
-                    doc.add_paragraph()  # Add spacing
-                    
-                    # Add signature areas
-                    sig_table = doc.add_table(rows=2, cols=2)
-                    sig_table.style = 'Light Grid Accent 1'
-                    
-                    # Header row
-                    sig_table.rows[0].cells[0].text = "Employer Signature"
-                    sig_table.rows[0].cells[1].text = "Manager Signature"
-                    
-                    # Signature lines (empty rows for signing)
-                    sig_table.rows[1].cells[0].text = "_" * 30
-                    sig_table.rows[1].cells[1].text = "_" * 30
+                # Add title and generated date to each page
+                title = doc.add_heading('Collections Summary Report', 0)
+                title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                
+                doc.add_paragraph(f'Generated on: {generated_on}')
+                doc.add_paragraph()
+                
+                # Add loan header info table
+                header_table = DocxTableWriter(doc, 2)
+                
+                # Row 1: Loan ID and Group Name
+                header_table.add_row([
+                    f"Loan ID: {item.get('loanId', 'N/A')}",
+                    f"Group Name: {item.get('groupName', 'N/A')}",
+                ], LOAN_HEADER_FORMAT)
+                
+                # Row 2: EMI Day and Collection Date
+                header_table.add_row([
+                    f"EMI Day: {item.get('emiDay', 'N/A')}",
+                    f"Collection Date: {item.get('collectionDate', 'N/A')}",
+                ], LOAN_HEADER_FORMAT)
+                header_table.finish()
+                
+                doc.add_paragraph()  # Add spacing
+                
+                # Create table with users and their details
+                # Columns: Member, Mobile, LA, Paid, Pending, EMI Adv, No EMI, No Paid, No Overdue, OD amt, Loan Adv, EMI amt
+                columns = ['Member', 'Mobile', 'LA', 'Paid', 'Pending', 'EMI Adv', 'No EMI', 'No Paid', 'No OD', 'OD Amt', 'Loan Adv', 'EMI Amt']
+                
+                user_table = DocxTableWriter(doc, len(columns), fixed_layout=True)
+                user_table.add_row(columns, USER_HEADER_FORMAT)
+                
+                # Calculate totals for this loan
+                total_no_od = 0
+                total_od_amt = 0
+                total_loan_adv = 0
+                total_emi_amt = 0
+                
+                # Add user rows (without ₹ symbols)
+                for user in user_details:
+                    user_table.add_row([
+                        user.get('userName', 'N/A'),
+                        user.get('mobileNumber', 'N/A'),
+                        f"{user.get('loanAmount', 0):,.0f}",
+                        f"{user.get('collectedAmount', 0):,.0f}",
+                        f"{user.get('pendingAmount', 0):,.0f}",
+                        f"{user.get('loanAdvance', 0):,.0f}",  # EMI Adv = loan member advance
+                        str(user.get('totalEmis', 0)),
+                        str(user.get('paidEmis', 0)),
+                        str(user.get('overdueEmis', 0)),  # No OD = count of EMIs with date < today
+                        f"{user.get('totalOverdueAmount', 0):,.0f}",  # OD Amt = sum of EMI amounts with date < today
+                        "100",  # Loan Adv = loan member advance
+                        f"{user.get('emiAmount', 0):,.0f}",
+                    ], USER_ROW_FORMATS)
                     
-                    # Format signature table
-                    for row in sig_table.rows:
-                        for cell in row.cells:
-                            for paragraph in cell.paragraphs:
-                                for run in paragraph.runs:
-                                    run.font.size = Pt(9)
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                    # Accumulate totals
+                    total_no_od += user.get('overdueEmis', 0)
+                    total_od_amt += user.get('totalOverdueAmount', 0)
+                    total_loan_adv += 100  # Loan Adv is fixed at 100
+                    total_emi_amt += user.get('emiAmount', 0)
+                
+                # Add total row: "Total Amount" across Member to No Paid columns (0-7),
+                # then the totals for No OD, OD Amt, Loan Adv, EMI Amt
+                user_table.add_row([
+                    "Total Amount", "", "", "", "", "", "", "",
+                    str(total_no_od),
+                    f"{total_od_amt:,.0f}",
+                    f"{total_loan_adv:,.0f}",
+                    f"{total_emi_amt:,.0f}",
+                ], TOTAL_ROW_FORMATS)
+                user_table.finish()
+                
+                doc.add_paragraph()  # Add spacing
+                
+                # Add summary values below table
+                summary_para = doc.add_paragraph()
+                summary_para.add_run(f"Total EMI Amount Collection: {total_emi_amt:,.0f}\n")
+                summary_para.add_run(f"Total Advance Collection: {total_loan_adv:,.0f}\n")
+                summary_para.add_run(f"Total Over Due Collection: {total_od_amt:,.0f}")
+                
+                for run in summary_para.runs:
+                    run.font.size = Pt(9)
+                
+                doc.add_paragraph()  # Add spacing
+                
+                # Add signature areas
+                sig_table = DocxTableWriter(doc, 2)
+                
+                # Header row
+                sig_table.add_row(["Employer Signature", "Manager Signature"], SIGNATURE_FORMAT)
+                
+                # Signature lines (empty rows for signing)
+                sig_table.add_row(["_" * 30, "_" * 30], SIGNATURE_FORMAT)
+                sig_table.finish()
+
+    @staticmethod
+    def _add_collection_pages_parallel(doc, collections_summary_data, generated_on: str):
+        """
+        Render the loan pages in chunks on the render process pool and append each chunk's
+        body elements to doc in order, as soon as it and every chunk before it are done.
+        """
+        chunk_size = max(settings.EXPORT_RENDER_CHUNK_LOANS, 1)
+        chunks = [
+            collections_summary_data[i:i + chunk_size]
+            for i in range(0, len(collections_summary_data), chunk_size)
+        ]
+        sect_pr = doc.element.body.sectPr
+        executor = _get_render_executor()
+        try:
+            for body_xml in executor.map(
+                _render_collection_pages,
+                chunks,
+                [generated_on] * len(chunks),
+                [i == 0 for i in range(len(chunks))],
+            ):
+                for element in list(parse_xml(body_xml)):
+                    sect_pr.addprevious(element)
+        except BrokenProcessPool:
+            _reset_render_executor(executor)
+            raise
+
+    @staticmethod
+    def export_collections_summary(collections_summary_data):
+        """
+        Export Collections Summary table with detailed user information to Word document.
+        With EXPORT_RENDER_PROCESSES above one and more than EXPORT_RENDER_CHUNK_LOANS loan pages,
+        the pages are rendered on a process pool.
+        """
+        try:
+            doc = COLLECTIONS_TEMPLATE.new_document()
+
+            generated_on = date.today().isoformat()
+            if settings.EXPORT_RENDER_PROCESSES > 1 and len(collections_summary_data) > settings.EXPORT_RENDER_CHUNK_LOANS:
+                # Only loans with user details get a page, so chunks hold whole pages
+                pages = [item for item in collections_summary_data if item.get('userDetails', [])]
+                ExportService._add_collection_pages_parallel(doc, pages, generated_on)
+            else:
+                ExportService._add_collection_pages(doc, collections_summary_data, generated_on)
             
             return doc
         except Exception as e:
             logger.exception(f"Error exporting collections summary: {str(e)}")
             raise
+
+
+def _render_collection_pages(collections_summary_data, generated_on: str, first_loan: bool) -> bytes:
+    """Render collections summary pages in a worker process; returns the document body without its sectPr"""
+    doc = COLLECTIONS_TEMPLATE.new_document()
+    ExportService._add_collection_pages(doc, collections_summary_data, generated_on, first_loan)
+    body = doc.element.body
+    body.remove(body.sectPr)
+    return etree.tostring(body)
+
+
+def _get_render_executor():
+    """Get the page render process pool of EXPORT_RENDER_PROCESSES workers, starting it on first use"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            # spawn, not fork: the API process has DB connections and threads a forked child must not inherit
+            _render_executor = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_executor
+
+
+def _reset_render_executor(executor):
+    """Drop a broken pool so the next export starts a new one"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is executor:
+            _render_executor = None
+    executor.shutdown(wait=False)
+
+
+class ExportReport(NamedTuple):
+    """A Word export: the report sections it needs and how to render them"""
+    filename_prefix: str
+    sections: tuple
+    include_details: bool
+    render: Callable
+
+
+# Exportable reports, keyed by the name used in the export routes
+EXPORT_REPORTS = {
+    "financial-summary": ExportReport(
+        "Financial_Summary",
+        ("metrics", "summary"),
+        False,
+        lambda data: ExportService.export_financial_summary(data['summary_data'], data['metrics']),
+    ),
+    "user-summary": ExportReport(
+        "User_Summary",
+        ("user",),
+        False,
+        lambda data: ExportService.export_user_summary(data['user_summary_data']),
+    ),
+    "emi-summary": ExportReport(
+        "EMI_Summary",
+        ("emi",),
+        True,
+        lambda data: ExportService.export_emi_summary(data['emi_summary_data']),
+    ),
+    "collections-summary": ExportReport(
+        "Collections_Summary",
+        ("collections",),
+        True,
+        lambda data: ExportService.export_collections_summary(data['collections_summary_data']),
+    ),
+}
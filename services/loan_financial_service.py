@@ -0,0 +1,307 @@
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.orm import Session
+from models.loan import Loan
+from models.loan_member import LoanMember
+from models.loan_member_emi import LoanMemberEmi
+from models.billing import Billing
+from models.loan_financial import LoanFinancial
+from datetime import datetime
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LoanFinancialService:
+    @staticmethod
+    def _aggregate_financials(db: Session, loan_ids: list, lock: bool = False) -> list:
+        """
+        Compute loan_financials rows for the given loans from loan_members, loan_member_emi and billing.
+        Returns transient LoanFinancial objects: one per loan (member_id None) and one per member.
+        lock reads the ledger rows with shared locks, so they reflect the latest committed data
+        rather than the transaction's snapshot.
+        """
+        rows = {}
+
+        def row_for(loan_id, member_id):
+            key = (loan_id, member_id)
+            if key not in rows:
+                rows[key] = LoanFinancial(
+                    loan_id=loan_id,
+                    member_id=member_id,
+                    member_count=0 if member_id is None else 1,
+                    emi_count=0,
+                    paid_emi_count=0,
+                    emi_total=Decimal("0"),
+                    emi_paid=Decimal("0"),
+                    emi_overdue=Decimal("0"),
+                    next_emi_date=None,
+                    next_emi_amount=Decimal("0"),
+                    billed_loan_amount=Decimal("0"),
+                    billed_interest=Decimal("0"),
+                    billed_payment=Decimal("0"),
+                    updated_at=datetime.utcnow(),
+                )
+            return rows[key]
+
+        if not loan_ids:
+            return []
+
+        for loan_id in loan_ids:
+            row_for(loan_id, None)
+
+        member_query = db.query(LoanMember.loan_id, LoanMember.member_id).filter(
+            LoanMember.loan_id.in_(loan_ids)
+        )
+        if lock:
+            member_query = member_query.with_for_update(read=True)
+        loan_members = member_query.all()
+        for loan_id, member_id in loan_members:
+            row_for(loan_id, None).member_count += 1
+            row_for(loan_id, member_id)
+
+        emi_query = db.query(
+            LoanMemberEmi.loan_id,
+            LoanMemberEmi.member_id,
+            LoanMemberEmi.emi_date,
+            LoanMemberEmi.emi_amount,
+            LoanMemberEmi.emi_status,
+        ).filter(
+            LoanMemberEmi.loan_id.in_(loan_ids)
+        ).order_by(LoanMemberEmi.id)
+        if lock:
+            emi_query = emi_query.with_for_update(read=True)
+        emi_records = emi_query.all()
+        for loan_id, member_id, emi_date, emi_amount, emi_status in emi_records:
+            amount = Decimal(str(emi_amount or 0))
+            status = (emi_status or "").upper()
+            for row in (row_for(loan_id, None), row_for(loan_id, member_id)):
+                row.emi_count += 1
+                row.emi_total += amount
+                if status == "PAID":
+                    row.paid_emi_count += 1
+                    row.emi_paid += amount
+                    continue
+                # Overdue matches the exact status, as the reports always have
+                if emi_status == "OVERDUE":
+                    row.emi_overdue += amount
+                # Next EMI is the earliest unpaid one, first created wins on the same date
+                if emi_date and (row.next_emi_date is None or emi_date < row.next_emi_date):
+                    row.next_emi_date = emi_date
+                    row.next_emi_amount = amount
+
+        billing_query = db.query(
+            Billing.loan_id,
+            Billing.member_id,
+            Billing.billing_code,
+            func.sum(Billing.amount),
+        ).filter(
+            Billing.loan_id.in_(loan_ids),
+            Billing.billing_code.in_(["LOAN_AMOUNT", "INTEREST", "PAYMENT"]),
+        ).group_by(Billing.loan_id, Billing.member_id, Billing.billing_code)
+        if lock:
+            billing_query = billing_query.with_for_update(read=True)
+        billing_totals = billing_query.all()
+        billing_columns = {
+            "LOAN_AMOUNT": "billed_loan_amount",
+            "INTEREST": "billed_interest",
+            "PAYMENT": "billed_payment",
+        }
+        for loan_id, member_id, billing_code, amount in billing_totals:
+            column = billing_columns[billing_code]
+            amount = Decimal(str(amount or 0))
+            for row in (row_for(loan_id, None), row_for(loan_id, member_id)):
+                setattr(row, column, getattr(row, column) + amount)
+
+        return list(rows.values())
+
+    @staticmethod
+    def refresh_loan(db: Session, loan_id: int) -> list:
+        """
+        Recompute the loan_financials rows of one loan inside the caller's transaction.
+        Pending changes are flushed first so the rows reflect them; the caller commits.
+        """
+        return LoanFinancialService.refresh_loans(db, [loan_id])
+
+    @staticmethod
+    def refresh_loans(db: Session, loan_ids: list) -> list:
+        """
+        Recompute the loan_financials rows of several loans at once, like refresh_loan.
+        The existing rows are locked and updated in place rather than deleted and reinserted,
+        so an apply_payments increment running concurrently waits and then lands on the new figures.
+        """
+        loan_ids = sorted(set(loan_ids))
+        if not loan_ids:
+            return []
+
+        db.flush()
+        existing = {}
+        for row in db.query(LoanFinancial).filter(
+            LoanFinancial.loan_id.in_(loan_ids)
+        ).order_by(LoanFinancial.id).with_for_update().populate_existing().all():
+            if (row.loan_id, row.member_id) in existing:
+                db.delete(row)
+            else:
+                existing[(row.loan_id, row.member_id)] = row
+
+        columns = [column.key for column in LoanFinancial.__table__.columns if column.key not in ("id", "loan_id", "member_id")]
+        rows = []
+        for computed in LoanFinancialService._aggregate_financials(db, loan_ids, lock=True):
+            row = existing.pop((computed.loan_id, computed.member_id), None)
+            if row is None:
+                db.add(computed)
+                rows.append(computed)
+                continue
+            for column in columns:
+                setattr(row, column, getattr(computed, column))
+            rows.append(row)
+
+        # Members no longer on the loan
+        for row in existing.values():
+            db.delete(row)
+        db.flush()
+        logger.debug(f"Refreshed {len(rows)} loan_financials rows for {len(loan_ids)} loans")
+        return rows
+
+    @staticmethod
+    def _next_emi(column):
+        """Correlated subquery for a column of the earliest unpaid EMI of a loan_financials row"""
+        return select(column).where(
+            LoanMemberEmi.loan_id == LoanFinancial.loan_id,
+            or_(LoanFinancial.member_id.is_(None), LoanMemberEmi.member_id == LoanFinancial.member_id),
+            func.upper(LoanMemberEmi.emi_status) != "PAID",
+        ).order_by(LoanMemberEmi.emi_date, LoanMemberEmi.id).limit(1).correlate(LoanFinancial).scalar_subquery()
+
+    @staticmethod
+    def apply_payments(db: Session, paid_emis: list, payments: list) -> None:
+        """
+        Add payments to the loan_financials rows as atomic SQL increments inside the caller's transaction,
+        so concurrent payments on the same loan add up instead of each recomputing the rows.
+        paid_emis are (loan_id, member_id, emi_date, emi_amount, previous_status) of EMIs the payments
+        moved to PAID; payments are (loan_id, member_id, amount) of the PAYMENT billing rows written.
+        Every affected row is updated by at most two statements, however many payments there are.
+        """
+        totals = {}
+
+        def totals_for(loan_id, member_id):
+            return totals.setdefault((loan_id, member_id), {
+                'paid_emi_count': 0,
+                'emi_paid': Decimal("0"),
+                'emi_overdue': Decimal("0"),
+                'billed_payment': Decimal("0"),
+                'emi_dates': set(),
+            })
+
+        for loan_id, member_id, emi_date, emi_amount, previous_status in paid_emis:
+            if (previous_status or "").upper() == "PAID":
+                continue
+            amount = Decimal(str(emi_amount or 0))
+            row = totals_for(loan_id, member_id)
+            row['paid_emi_count'] += 1
+            row['emi_paid'] += amount
+            if previous_status == "OVERDUE":
+                row['emi_overdue'] += amount
+            row['emi_dates'].add(emi_date)
+
+        for loan_id, member_id, amount in payments:
+            totals_for(loan_id, member_id)['billed_payment'] += Decimal(str(amount or 0))
+
+        if not totals:
+            return
+
+        # Each member's figures also go to the loan row
+        for (loan_id, member_id), row in list(totals.items()):
+            loan_row = totals_for(loan_id, None)
+            for field in ('paid_emi_count', 'emi_paid', 'emi_overdue', 'billed_payment'):
+                loan_row[field] += row[field]
+            loan_row['emi_dates'] |= row['emi_dates']
+
+        def row_filter(loan_id, member_id):
+            if member_id is None:
+                return and_(LoanFinancial.loan_id == loan_id, LoanFinancial.member_id.is_(None))
+            return and_(LoanFinancial.loan_id == loan_id, LoanFinancial.member_id == member_id)
+
+        def per_row(field):
+            return case(*[(row_filter(*key), row[field]) for key, row in totals.items()], else_=0)
+
+        # One UPDATE for every row, with a CASE per column
+        db.query(LoanFinancial).filter(or_(*[row_filter(*key) for key in totals])).update({
+            LoanFinancial.paid_emi_count: LoanFinancial.paid_emi_count + per_row('paid_emi_count'),
+            LoanFinancial.emi_paid: LoanFinancial.emi_paid + per_row('emi_paid'),
+            LoanFinancial.emi_overdue: LoanFinancial.emi_overdue - per_row('emi_overdue'),
+            LoanFinancial.billed_payment: LoanFinancial.billed_payment + per_row('billed_payment'),
+            LoanFinancial.updated_at: datetime.utcnow(),
+        }, synchronize_session=False)
+
+        # The next EMI only moves on rows whose next EMI was paid
+        moved = [
+            and_(row_filter(*key), LoanFinancial.next_emi_date.in_(row['emi_dates']))
+            for key, row in totals.items()
+            if row['emi_dates']
+        ]
+        if moved:
+            db.query(LoanFinancial).filter(or_(*moved)).update({
+                LoanFinancial.next_emi_date: LoanFinancialService._next_emi(LoanMemberEmi.emi_date),
+                LoanFinancial.next_emi_amount: func.coalesce(LoanFinancialService._next_emi(LoanMemberEmi.emi_amount), 0),
+            }, synchronize_session=False)
+
+        logger.debug(f"Applied payments to {len(totals)} loan_financials rows")
+
+    @staticmethod
+    def get_financials(db: Session, loan_ids: list) -> dict:
+        """
+        Get loan_financials rows keyed by (loan_id, member_id), member_id None being the loan total.
+        Loans that have not been projected yet are computed from the ledger without being stored.
+        """
+        if not loan_ids:
+            return {}
+
+        rows = db.query(LoanFinancial).filter(LoanFinancial.loan_id.in_(loan_ids)).all()
+        financials = {(row.loan_id, row.member_id): row for row in rows}
+
+        missing_loan_ids = [loan_id for loan_id in loan_ids if (loan_id, None) not in financials]
+        if missing_loan_ids:
+            logger.warning(f"loan_financials missing for {len(missing_loan_ids)} loans, computing from ledger")
+            for row in LoanFinancialService._aggregate_financials(db, missing_loan_ids):
+                financials[(row.loan_id, row.member_id)] = row
+
+        return financials
+
+    @staticmethod
+    def rebuild(db: Session, batch_size: int = 500) -> int:
+        """Recompute loan_financials for every loan from loan_member_emi and billing"""
+        logger.info("Rebuilding loan_financials")
+        loan_ids = [loan_id for (loan_id,) in db.query(Loan.id).order_by(Loan.id).all()]
+        row_count = 0
+
+        for start in range(0, len(loan_ids), batch_size):
+            batch = loan_ids[start:start + batch_size]
+            try:
+                db.query(LoanFinancial).filter(
+                    LoanFinancial.loan_id.in_(batch)
+                ).delete(synchronize_session=False)
+                rows = LoanFinancialService._aggregate_financials(db, batch)
+                db.add_all(rows)
+                db.commit()
+                row_count += len(rows)
+            except Exception as e:
+                logger.exception(f"Error rebuilding loan_financials: {str(e)}")
+                db.rollback()
+                raise
+            logger.info(f"Rebuilt loan_financials for {min(start + batch_size, len(loan_ids))}/{len(loan_ids)} loans")
+
+        return row_count
+
+
+if __name__ == "__main__":
+    # python -m services.loan_financial_service
+    from database import SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    LoanFinancial.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        count = LoanFinancialService.rebuild(session)
+        logger.info(f"Rebuilt {count} loan_financials rows")
+    finally:
+        session.close()
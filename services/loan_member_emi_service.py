@@ -4,6 +4,8 @@ from models.loan_member_emi import LoanMemberEmi
 from models.loan import Loan
 from models.loan_member import LoanMember
 from schemas.loan_member_emi import LoanMemberEmiCreate
+from services.loan_financial_service import LoanFinancialService
+from services.report_cache import report_cache
 from datetime import datetime, timedelta
 from decimal import Decimal
 import math
@@ -16,8 +18,12 @@ logger.setLevel(logging.DEBUG)
 
 class LoanMemberEmiService:
     @staticmethod
-    def generate_emi_schedule(db: Session, loan_id: int, created_by: str) -> list:
-        """Generate EMI schedule for all members of a loan"""
+    def generate_emi_schedule(db: Session, loan_id: int, created_by: str, commit: bool = True) -> list:
+        """
+        Generate EMI schedule for all members of a loan.
+        With commit=False the records are only flushed into the caller's transaction and errors are raised;
+        the caller refreshes loan_financials and commits.
+        """
         logger.info(f"Starting EMI schedule generation for loan_id: {loan_id}")
         try:
             loan = db.query(Loan).filter(Loan.id == loan_id).first()
@@ -112,17 +118,25 @@ class LoanMemberEmiService:
                 logger.debug(f"Created {num_installments} EMI records for member {loan_member.member_id}")
 
             # Commit all records
-            db.commit()
-            logger.info(f"Successfully committed {len(emi_records)} EMI records to database")
-            
-            for record in emi_records:
-                db.refresh(record)
+            if commit:
+                # Project the new schedule into loan_financials in the same transaction
+                LoanFinancialService.refresh_loan(db, loan_id)
+                emi_ids = [record.id for record in emi_records]
+                db.commit()
+                logger.info(f"Successfully committed {len(emi_records)} EMI records to database")
+
+                # Reload the committed records with one query instead of a refresh per record
+                emi_records = db.query(LoanMemberEmi).filter(LoanMemberEmi.id.in_(emi_ids)).order_by(LoanMemberEmi.id).all()
+            else:
+                db.flush()
 
             logger.info(f"EMI schedule generation completed successfully for loan_id: {loan_id}")
             return emi_records
         
         except Exception as e:
             logger.exception(f"Error generating EMI schedule for loan_id: {loan_id} - Error: {str(e)}")
+            if not commit:
+                raise
             db.rollback()
             return []
 
@@ -158,9 +172,11 @@ class LoanMemberEmiService:
             
             emi.updated_by = updated_by
             emi.updated_at = datetime.now()
-            
+
+            LoanFinancialService.refresh_loan(db, emi.loan_id)
             db.commit()
             db.refresh(emi)
+            report_cache.invalidate_loans([emi.loan_id])
         
         return emi
 
@@ -168,5 +184,7 @@ class LoanMemberEmiService:
     def delete_emi_schedule(db: Session, loan_id: int) -> int:
         """Delete EMI schedule for a loan"""
         count = db.query(LoanMemberEmi).filter(LoanMemberEmi.loan_id == loan_id).delete()
+        LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
+        report_cache.invalidate_loans([loan_id])
         return count
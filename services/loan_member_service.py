@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from models.loan_member import LoanMember
 from models.member import Member
 from schemas.loan_member import LoanMemberCreate
+from services.loan_financial_service import LoanFinancialService
+from services.report_cache import report_cache, filter_options_cache
 from datetime import datetime
 
 
@@ -22,8 +24,11 @@ class LoanMemberService:
             created_by=loan_member.created_by,
         )
         db.add(db_loan_member)
+        LoanFinancialService.refresh_loan(db, db_loan_member.loan_id)
         db.commit()
         db.refresh(db_loan_member)
+        report_cache.invalidate_loans([db_loan_member.loan_id])
+        filter_options_cache.clear()
         return db_loan_member
 
     @staticmethod
@@ -62,9 +67,12 @@ class LoanMemberService:
                     db.add(db_loan_member)
                     loan_members.append(db_loan_member)
         
+        LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
         for loan_member in loan_members:
             db.refresh(loan_member)
+        report_cache.invalidate_loans([loan_id])
+        filter_options_cache.clear()
         
         return loan_members
 
@@ -82,21 +90,34 @@ class LoanMemberService:
     def delete_loan_members(db: Session, loan_id: int) -> int:
         """Delete all loan members for a specific loan"""
         count = db.query(LoanMember).filter(LoanMember.loan_id == loan_id).delete()
+        LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
+        report_cache.invalidate_loans([loan_id])
+        filter_options_cache.clear()
         return count
 
     @staticmethod
-    def update_loan_members_amount(db: Session, loan_id: int, new_amount: float) -> list:
-        """Update the amount for all members of a loan"""
+    def update_loan_members_amount(db: Session, loan_id: int, new_amount: float, commit: bool = True) -> list:
+        """
+        Update the amount for all members of a loan.
+        With commit=False the changes are only flushed into the caller's transaction;
+        the caller refreshes loan_financials, commits and invalidates the report cache.
+        """
         loan_members = db.query(LoanMember).filter(LoanMember.loan_id == loan_id).all()
         
         for loan_member in loan_members:
             loan_member.amount = new_amount
             loan_member.pending = new_amount
         
+        if not commit:
+            db.flush()
+            return loan_members
+
+        LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
         for loan_member in loan_members:
             db.refresh(loan_member)
+        report_cache.invalidate_loans([loan_id])
         
         return loan_members
 
@@ -108,8 +129,10 @@ class LoanMemberService:
         if loan_member:
             loan_member.collected = collected_amount
             loan_member.pending = loan_member.amount - collected_amount
+            LoanFinancialService.refresh_loan(db, loan_member.loan_id)
             db.commit()
             db.refresh(loan_member)
+            report_cache.invalidate_loans([loan_member.loan_id])
         
         return loan_member
 
@@ -122,8 +145,10 @@ class LoanMemberService:
             loan_member.collected = collected_amount
             loan_member.pending = loan_member.amount - collected_amount
         
+        LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
         for loan_member in loan_members:
             db.refresh(loan_member)
+        report_cache.invalidate_loans([loan_id])
         
         return loan_members
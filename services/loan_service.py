@@ -4,6 +4,9 @@ from schemas.loan import LoanCreate, LoanUpdate
 from services.loan_member_service import LoanMemberService
 from services.loan_member_emi_service import LoanMemberEmiService
 from services.billing_service import BillingService
+from services.loan_financial_service import LoanFinancialService
+from services.report_cache import report_cache, filter_options_cache
+from services.pagination import paginate_keyset
 from datetime import datetime
 
 
@@ -60,11 +63,19 @@ class LoanService:
         return db.query(Loan).filter(Loan.id == loan_id, Loan.del_mark == 'N').first()
 
     @staticmethod
-    def get_loans(db: Session, skip: int = 0, limit: int = 100) -> list:
-        """Get all active loans"""
-        return db.query(Loan).filter(
-            Loan.del_mark == 'N'
-        ).order_by(Loan.id.desc()).offset(skip).limit(limit).all()
+    def get_loans(db: Session, skip: int = 0, limit: int = 100, after: str = None) -> tuple:
+        """
+        Get one page of active loans, newest first.
+        Returns the loans and the cursor of the next page; pass it as after to continue.
+        """
+        return paginate_keyset(
+            db.query(Loan).filter(Loan.del_mark == 'N'),
+            [Loan.id],
+            limit,
+            cursor=after,
+            descending=True,
+            offset=skip,
+        )
 
     @staticmethod
     def get_loans_by_member(db: Session, member_id: int, skip: int = 0, limit: int = 100) -> list:
@@ -96,8 +107,8 @@ class LoanService:
             db_loan.application_date = loan.application_date
         if loan.loan_amount is not None:
             db_loan.loan_amount = loan.loan_amount
-            # Sync loan amount to all loan members
-            LoanMemberService.update_loan_members_amount(db, loan_id, loan.loan_amount)
+            # Sync loan amount to all loan members, committed with the loan below
+            LoanMemberService.update_loan_members_amount(db, loan_id, loan.loan_amount, commit=False)
         if loan.loan_type is not None:
             db_loan.loan_type = loan.loan_type
         if loan.interest_rate is not None:
@@ -134,6 +145,7 @@ class LoanService:
             db_loan.credit_officer_comments = loan.credit_officer_comments
         if loan.verification_status is not None:
             db_loan.verification_status = loan.verification_status
+        approved = False
         if loan.loan_status is not None:
             old_status = db_loan.loan_status
             db_loan.loan_status = loan.loan_status
@@ -141,9 +153,11 @@ class LoanService:
             # Generate EMI schedule and create billing entries when status changes to 'Approved'
             if loan.loan_status == 'Approved' and old_status != 'Approved':
                 updated_by = loan.updated_by or 'system'
-                LoanMemberEmiService.generate_emi_schedule(db, loan_id, updated_by)
+                # Schedule and billing join this transaction and are committed with the loan below
+                LoanMemberEmiService.generate_emi_schedule(db, loan_id, updated_by, commit=False)
                 # Create billing entries for loan approval
-                BillingService.create_loan_approval_billing(db, loan_id, updated_by)
+                BillingService.create_loan_approval_billing(db, loan_id, updated_by, commit=False)
+                approved = True
         
         if loan.assign_to is not None:
             db_loan.assign_to = loan.assign_to
@@ -153,8 +167,24 @@ class LoanService:
         
         db_loan.updated_at = datetime.utcnow()
         db.add(db_loan)
+        # Project the amount sync, schedule and billing into loan_financials once
+        if loan.loan_amount is not None or approved:
+            LoanFinancialService.refresh_loan(db, loan_id)
         db.commit()
         db.refresh(db_loan)
+
+        # Status, staff and EMI day changes can move the loan into or out of any cached report
+        if loan.loan_status is not None or loan.assign_to is not None or loan.emi_day is not None:
+            report_cache.clear()
+        else:
+            report_cache.invalidate_loans([loan_id])
+        if (
+            loan.loan_status is not None
+            or loan.assign_to is not None
+            or loan.emi_day is not None
+            or loan.member_group_id is not None
+        ):
+            filter_options_cache.clear()
         return db_loan
 
     @staticmethod
@@ -172,6 +202,8 @@ class LoanService:
         db.add(db_loan)
         db.commit()
         db.refresh(db_loan)
+        report_cache.clear()
+        filter_options_cache.clear()
         return db_loan
 
     @staticmethod
@@ -189,6 +221,8 @@ class LoanService:
         db.add(db_loan)
         db.commit()
         db.refresh(db_loan)
+        report_cache.clear()
+        filter_options_cache.clear()
         return db_loan
 
     @staticmethod
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from models.member_group import MemberGroup
 from schemas.member_group import MemberGroupCreate, MemberGroupUpdate
+from services.report_cache import report_cache, filter_options_cache
+from services.pagination import paginate_keyset
 from datetime import datetime
 
 
@@ -31,11 +33,19 @@ class MemberGroupService:
         ).first()
 
     @staticmethod
-    def get_groups(db: Session, skip: int = 0, limit: int = 100) -> list:
-        """Get all active groups"""
-        return db.query(MemberGroup).filter(
-            MemberGroup.del_mark == 'N'
-        ).order_by(MemberGroup.id.desc()).offset(skip).limit(limit).all()
+    def get_groups(db: Session, skip: int = 0, limit: int = 100, after: str = None) -> tuple:
+        """
+        Get one page of active groups, newest first.
+        Returns the groups and the cursor of the next page; pass it as after to continue.
+        """
+        return paginate_keyset(
+            db.query(MemberGroup).filter(MemberGroup.del_mark == 'N'),
+            [MemberGroup.id],
+            limit,
+            cursor=after,
+            descending=True,
+            offset=skip,
+        )
 
     @staticmethod
     def update_group(db: Session, group_id: int, group_update: MemberGroupUpdate) -> MemberGroup:
@@ -53,6 +63,9 @@ class MemberGroupService:
         db.add(db_group)
         db.commit()
         db.refresh(db_group)
+        # Reports show group names, so any cached report may include this group
+        report_cache.clear()
+        filter_options_cache.clear()
         return db_group
 
     @staticmethod
@@ -70,6 +83,7 @@ class MemberGroupService:
         db.add(db_group)
         db.commit()
         db.refresh(db_group)
+        filter_options_cache.clear()
         return db_group
 
     @staticmethod
@@ -87,6 +101,7 @@ class MemberGroupService:
         db.add(db_group)
         db.commit()
         db.refresh(db_group)
+        filter_options_cache.clear()
         return db_group
 
     @staticmethod
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.member import Member
 from schemas.member import MemberCreate, MemberUpdate
+from services.pagination import paginate_keyset
 from datetime import datetime
 
 
@@ -63,11 +64,19 @@ class MemberService:
         ).first()
 
     @staticmethod
-    def get_members(db: Session, skip: int = 0, limit: int = 100) -> list:
-        """Get all active members"""
-        return db.query(Member).filter(
-            Member.del_mark == 'N'
-        ).order_by(Member.id.desc()).offset(skip).limit(limit).all()
+    def get_members(db: Session, skip: int = 0, limit: int = 100, after: str = None) -> tuple:
+        """
+        Get one page of active members, newest first.
+        Returns the members and the cursor of the next page; pass it as after to continue.
+        """
+        return paginate_keyset(
+            db.query(Member).filter(Member.del_mark == 'N'),
+            [Member.id],
+            limit,
+            cursor=after,
+            descending=True,
+            offset=skip,
+        )
 
     @staticmethod
     def get_member_by_mobile(db: Session, mobile_number: str) -> Member:
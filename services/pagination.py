@@ -0,0 +1,112 @@
+from sqlalchemy import and_, or_
+from datetime import date, datetime
+from decimal import Decimal
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort values of the last row of a page into an opaque cursor"""
+    encoded = []
+    for value in values:
+        if isinstance(value, Decimal):
+            encoded.append({"d": str(value)})
+        elif isinstance(value, datetime):
+            encoded.append({"t": value.isoformat()})
+        elif isinstance(value, date):
+            encoded.append({"D": value.isoformat()})
+        else:
+            encoded.append(value)
+    raw = json.dumps(encoded, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor produced by encode_cursor back into sort values"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        encoded = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(encoded, list):
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for value in encoded:
+        try:
+            if isinstance(value, dict) and "d" in value:
+                values.append(Decimal(value["d"]))
+            elif isinstance(value, dict) and "t" in value:
+                values.append(datetime.fromisoformat(value["t"]))
+            elif isinstance(value, dict) and "D" in value:
+                values.append(date.fromisoformat(value["D"]))
+            elif value is None or isinstance(value, (str, int, float)):
+                values.append(value)
+            else:
+                raise ValueError("Invalid cursor")
+        except (ValueError, TypeError, ArithmeticError):
+            raise ValueError("Invalid cursor")
+    return values
+
+
+def apply_keyset(query, columns: list, cursor: str = None, descending: bool = False, scope: str = None):
+    """
+    Order query by columns (the last one must be unique, e.g. the primary key) and,
+    when a cursor is given, keep only the rows after it.
+    scope names the ordering when callers can change it (e.g. the sort key); a cursor issued
+    under another scope is rejected instead of silently matching the wrong rows.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if scope is not None:
+            if not values or values[0] != scope:
+                raise ValueError("Cursor does not match the requested sort order")
+            values = values[1:]
+        if len(values) != len(columns):
+            raise ValueError("Invalid cursor")
+
+        # (c1, c2, ...) > (v1, v2, ...) expanded so every column keeps its own index
+        clauses = []
+        for i, column in enumerate(columns):
+            comparison = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*[columns[j] == values[j] for j in range(i)], comparison))
+        query = query.filter(or_(*clauses))
+
+    return query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+
+def paginate_keyset(
+    query,
+    columns: list,
+    limit: int,
+    cursor: str = None,
+    descending: bool = False,
+    offset: int = 0,
+    scope: str = None,
+):
+    """
+    Fetch one keyset page of query ordered by columns.
+    Returns the rows of the page (entities, or tuples when the query selects several)
+    and the cursor of the next page (None on the last page).
+    offset skips rows after the cursor; it only exists for callers that still page by skip.
+    scope is checked and carried in the cursor as in apply_keyset.
+    """
+    if limit < 1:
+        return [], None
+
+    page_query = apply_keyset(query.add_columns(*columns), columns, cursor, descending, scope)
+    if offset:
+        page_query = page_query.offset(offset)
+    rows = page_query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        values = tuple(rows[-1])[-len(columns):]
+        next_cursor = encode_cursor(*values) if scope is None else encode_cursor(scope, *values)
+
+    items = []
+    for row in rows:
+        entities = tuple(row)[:-len(columns)]
+        items.append(entities[0] if len(entities) == 1 else entities)
+    return items, next_cursor
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from config import settings
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    In-process LRU cache for report results with TTL expiry.
+    Each entry remembers the loan ids it was built from so writes to a loan only
+    drop the entries that include it. Entries stored without loan ids are dropped on any write.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(**filters) -> tuple:
+        """Build a cache key from filters, ignoring list order and duplicates"""
+        key = []
+        for name in sorted(filters):
+            value = filters[name]
+            if isinstance(value, (list, tuple, set)):
+                value = tuple(sorted(set(value), key=str)) or None
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            key.append((name, value))
+        return tuple(key)
+
+    def get(self, key: tuple):
+        """Return the cached value for key, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, loan_ids, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: tuple, value, loan_ids=None):
+        """Store value under key, evicting the least recently used entries beyond max_entries"""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            loan_ids = frozenset(loan_ids) if loan_ids is not None else None
+            self._entries[key] = (value, loan_ids, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_loans(self, loan_ids):
+        """Drop every entry that was built from any of the given loans"""
+        loan_ids = {loan_id for loan_id in loan_ids if loan_id is not None}
+        if not loan_ids:
+            return
+
+        with self._lock:
+            stale_keys = [
+                key for key, (_, entry_loan_ids, _) in self._entries.items()
+                if entry_loan_ids is None or entry_loan_ids & loan_ids
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+            self.invalidations += len(stale_keys)
+
+        if stale_keys:
+            logger.debug(f"Invalidated {len(stale_keys)} cached reports for loans {sorted(loan_ids)}")
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+report_cache = ReportCache(
+    max_entries=settings.REPORT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+)
+
+# Report filter options; holds a single entry that is cleared when loans, groups or staff change
+filter_options_cache = ReportCache(
+    max_entries=1,
+    ttl_seconds=settings.FILTER_OPTIONS_CACHE_TTL_SECONDS,
+)
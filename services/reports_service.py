@@ -1,15 +1,52 @@
+from sqlalchemy import and_, distinct, func
 from sqlalchemy.orm import Session
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from config import settings
+from database import SessionLocal
 from models.loan import Loan
 from models.loan_member import LoanMember
 from models.member_group import MemberGroup
 from models.staff import Staff
 from models.loan_member_emi import LoanMemberEmi
 from models.billing import Billing
+from models.loan_financial import LoanFinancial
+from services.report_cache import report_cache, filter_options_cache
+from services.loan_financial_service import LoanFinancialService
+from services.pagination import decode_cursor, encode_cursor, paginate_keyset
+import hashlib
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Loans processed per chunk when streaming report rows
+REPORT_STREAM_CHUNK_SIZE = 200
+
+# Bounded pool for parallel section computation, shared across requests so the
+# sessions it opens never exceed REPORT_SECTION_WORKERS connections of the DB pool
+_section_executor = ThreadPoolExecutor(
+    max_workers=settings.REPORT_SECTION_WORKERS,
+    thread_name_prefix="report-section",
+)
+
+# Key of the single filter_options_cache entry
+FILTER_OPTIONS_CACHE_KEY = ("filter_options",)
+
+# Report sections that can be paged with get_section_page, and the keys they can be sorted by
+PAGED_SECTIONS = ("summary", "user", "collections")
+SECTION_SORT_KEYS = ("loanId", "pending", "overdue", "group")
+
+# Report sections that can be requested from get_reports_data, mapped to their response keys
+REPORT_SECTIONS = {
+    "metrics": "metrics",
+    "summary": "summary_data",
+    "user": "user_summary_data",
+    "emi": "emi_summary_data",
+    "collections": "collections_summary_data",
+}
+
 
 class ReportsService:
     @staticmethod
@@ -86,6 +123,116 @@ class ReportsService:
                 "loans": [],
             }
 
+    @staticmethod
+    def get_cached_filter_options(
+        db: Session,
+        member_prefix: str = None,
+        loan_prefix: str = None,
+        limit: int = None,
+    ) -> tuple:
+        """
+        Get filter options from the cache, loading them on a miss.
+        member_prefix and loan_prefix keep only the members whose name and the loans whose
+        loan number start with them (case-insensitive), and limit caps those two lists.
+        Returns the options and an ETag that changes whenever the returned options do.
+        """
+        cached = filter_options_cache.get(FILTER_OPTIONS_CACHE_KEY)
+        if cached is None:
+            options = ReportsService.get_filter_options(db)
+            etag = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()
+            cached = (options, etag)
+            # The error fallback has only empty lists, so it is never cached
+            if any(options.values()):
+                filter_options_cache.set(FILTER_OPTIONS_CACHE_KEY, cached)
+
+        options, etag = cached
+        if member_prefix is None and loan_prefix is None and limit is None:
+            return options, etag
+
+        options = dict(options)
+        if member_prefix is not None:
+            prefix = member_prefix.lower()
+            options["members"] = [m for m in options["members"] if (m["name"] or "").lower().startswith(prefix)]
+        if loan_prefix is not None:
+            prefix = loan_prefix.lower()
+            options["loans"] = [l for l in options["loans"] if (l["loan_id"] or "").lower().startswith(prefix)]
+        if limit is not None:
+            options["members"] = options["members"][:limit]
+            options["loans"] = options["loans"][:limit]
+
+        variant = json.dumps([member_prefix, loan_prefix, limit])
+        return options, hashlib.sha1(f"{etag}:{variant}".encode()).hexdigest()
+
+    @staticmethod
+    def get_data_version(db: Session, **filters) -> str:
+        """
+        Get a version of the data behind the reports for the filtered loans, changing whenever a
+        loan, its members, EMIs, billing or financials, or any member group changes.
+        Read in one statement of aggregates so it is cheap enough to check before every export.
+        """
+        loan_query = ReportsService._build_loan_query(db, **filters)
+        loan_id_query = loan_query.with_entities(Loan.id)
+        version = db.query(
+            loan_query.with_entities(func.count(Loan.id)).scalar_subquery(),
+            loan_query.with_entities(func.max(Loan.updated_at)).scalar_subquery(),
+            db.query(func.count(LoanMember.id)).filter(LoanMember.loan_id.in_(loan_id_query)).scalar_subquery(),
+            db.query(func.max(LoanMember.id)).filter(LoanMember.loan_id.in_(loan_id_query)).scalar_subquery(),
+            db.query(func.max(Billing.id)).filter(Billing.loan_id.in_(loan_id_query)).scalar_subquery(),
+            db.query(func.max(LoanMemberEmi.updated_at)).filter(LoanMemberEmi.loan_id.in_(loan_id_query)).scalar_subquery(),
+            db.query(func.max(LoanFinancial.updated_at)).filter(LoanFinancial.loan_id.in_(loan_id_query)).scalar_subquery(),
+            db.query(func.max(MemberGroup.updated_at)).scalar_subquery(),
+        ).one()
+        return hashlib.sha1(json.dumps(list(version), default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _build_loan_query(
+        db: Session,
+        start_date: date = None,
+        end_date: date = None,
+        emi_days: list = None,
+        member_ids: list = None,
+        group_ids: list = None,
+        staff_ids: list = None,
+        loan_ids: list = None,
+    ):
+        """Build the filtered query of approved loans shared by all report sections"""
+        # Build base query
+        query = db.query(Loan).filter(
+            Loan.del_mark == "N",
+            Loan.loan_status == "Approved",
+        )
+
+        # Apply date range filter
+        if start_date:
+            query = query.filter(Loan.created_at >= start_date)
+        if end_date:
+            query = query.filter(Loan.created_at <= end_date)
+
+        # Apply EMI day filter
+        if emi_days:
+            query = query.filter(Loan.emi_day.in_(emi_days))
+
+        # Apply staff filter
+        if staff_ids:
+            query = query.filter(Loan.assign_to.in_(staff_ids))
+
+        # Apply loan ID filter
+        if loan_ids:
+            query = query.filter(Loan.id.in_(loan_ids))
+
+        # Apply member group and member filters through an EXISTS on loan_members
+        if group_ids or member_ids:
+            member_query = db.query(LoanMember.id).filter(
+                LoanMember.loan_id == Loan.id
+            ).correlate(Loan)
+            if group_ids:
+                member_query = member_query.filter(LoanMember.member_group_id.in_(group_ids))
+            if member_ids:
+                member_query = member_query.filter(LoanMember.id.in_(member_ids))
+            query = query.filter(member_query.exists())
+
+        return query
+
     @staticmethod
     def get_reports_data(
         db: Session,
@@ -96,95 +243,473 @@ class ReportsService:
         group_ids: list = None,
         staff_ids: list = None,
         loan_ids: list = None,
+        sections: list = None,
+        include_details: bool = False,
+        use_cache: bool = True,
+        parallel: bool = False,
     ):
-        """Get reports data with filters applied"""
+        """
+        Get reports data with filters applied.
+        Only the requested sections are computed (all of them when sections is None).
+        The nested emiDetails and userDetails arrays are only built when include_details is set.
+        parallel computes each section concurrently on its own session and adds per-section timings
+        under "metadata".
+        Results are served from the report cache when use_cache is set and must be treated as read-only.
+        """
         try:
-            # Build base query
-            query = db.query(Loan).filter(
-                Loan.del_mark == "N",
-                Loan.loan_status == "Approved",
+            sections = [name for name in REPORT_SECTIONS if sections is None or name in sections]
+
+            cache_key = report_cache.make_key(
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+                sections=sections,
+                include_details=include_details,
+                parallel=parallel,
+            )
+            if use_cache:
+                cached = report_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            if parallel:
+                result, result_loan_ids = ReportsService._compute_sections_parallel(
+                    sections,
+                    include_details,
+                    start_date=start_date,
+                    end_date=end_date,
+                    emi_days=emi_days,
+                    member_ids=member_ids,
+                    group_ids=group_ids,
+                    staff_ids=staff_ids,
+                    loan_ids=loan_ids,
+                )
+                if use_cache:
+                    report_cache.set(cache_key, result, result_loan_ids)
+                return result
+
+            loan_query = ReportsService._build_loan_query(
+                db,
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
             )
 
-            # Apply date range filter
-            if start_date:
-                query = query.filter(Loan.created_at >= start_date)
-            if end_date:
-                query = query.filter(Loan.created_at <= end_date)
+            result, result_loan_ids = ReportsService._compute_sections(
+                db, loan_query, sections, include_details
+            )
 
-            # Apply EMI day filter
-            if emi_days:
-                query = query.filter(Loan.emi_day.in_(emi_days))
+            if use_cache:
+                report_cache.set(cache_key, result, result_loan_ids)
 
-            # Apply staff filter
-            if staff_ids:
-                query = query.filter(Loan.assign_to.in_(staff_ids))
+            return result
 
-            # Apply loan ID filter
-            if loan_ids:
-                query = query.filter(Loan.id.in_(loan_ids))
+        except Exception as e:
+            logger.exception(f"Error fetching reports data: {str(e)}")
+            return {
+                "metrics": {},
+                "summary_data": [],
+                "loans_count": 0,
+            }
+
+    @staticmethod
+    def iter_reports_data(
+        db: Session,
+        start_date: date = None,
+        end_date: date = None,
+        emi_days: list = None,
+        member_ids: list = None,
+        group_ids: list = None,
+        staff_ids: list = None,
+        loan_ids: list = None,
+        sections: list = None,
+        include_details: bool = False,
+        chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+    ):
+        """
+        Yield report data one item at a time for streaming: the metrics first, then one
+        {"section": ..., "data": row} per summary, user, EMI or collection row, then an "end" item.
+        Loans are read in keyset pages of chunk_size by Loan.id, one short query per chunk, so memory
+        stays bounded without relying on server-side cursors (mysql-connector always buffers results).
+        """
+        try:
+            sections = [name for name in REPORT_SECTIONS if sections is None or name in sections]
+            loan_query = ReportsService._build_loan_query(
+                db,
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            )
 
-            loans = query.all()
+            metrics = None
+            if "metrics" in sections:
+                metrics = ReportsService._calculate_metrics(db, loan_query)
+                yield {"section": "metrics", "data": metrics}
+
+            row_sections = [name for name in sections if name != "metrics"]
+            if not row_sections:
+                yield {"section": "end", "loans_count": metrics.get("totalLoans", 0) if metrics else loan_query.count()}
+                return
+
+            next_ids = {name: 1 for name in row_sections}
+            loans_count = 0
+            cursor = None
+            while True:
+                chunk, cursor = paginate_keyset(loan_query, [Loan.id], chunk_size, cursor)
+                if chunk:
+                    yield from ReportsService._iter_chunk_rows(db, chunk, row_sections, include_details, next_ids)
+                    loans_count += len(chunk)
+                if cursor is None:
+                    break
+
+            yield {"section": "end", "loans_count": loans_count}
+        except Exception as e:
+            logger.exception(f"Error streaming reports data: {str(e)}")
+            yield {"section": "error", "message": str(e)}
 
-            # Filter by member groups and members (requires joining with LoanMember)
-            if group_ids or member_ids:
-                filtered_loans = []
-                for loan in loans:
-                    loan_members = db.query(LoanMember).filter(
-                        LoanMember.loan_id == loan.id
-                    ).all()
+    @staticmethod
+    def _iter_chunk_rows(db: Session, loans: list, sections: list, include_details: bool, next_ids: dict):
+        """Yield the rows of every requested section for one chunk of loans, continuing the row ids in next_ids"""
+        context = ReportsService._build_report_context(db, loans, sections, include_details)
+
+        section_rows = {
+            "summary": lambda start_id: ReportsService._iter_summary_rows(loans, context, start_id),
+            "user": lambda start_id: ReportsService._iter_user_summary_rows(
+                ReportsService._loan_member_pairs(loans, context), context, start_id
+            ),
+            "emi": lambda start_id: ReportsService._iter_emi_summary_rows(loans, context, include_details, start_id),
+            "collections": lambda start_id: ReportsService._iter_collections_summary_rows(
+                loans, context, include_details, start_id
+            ),
+        }
+        for section in sections:
+            for row in section_rows[section](next_ids[section]):
+                next_ids[section] += 1
+                yield {"section": section, "data": row}
+
+        # Drop the chunk's members, groups and EMIs so memory stays flat across chunks
+        db.expunge_all()
 
-                    if group_ids:
-                        loan_members = [
-                            m for m in loan_members if m.member_group_id in group_ids
-                        ]
+    @staticmethod
+    def get_section_page(
+        db: Session,
+        section: str,
+        start_date: date = None,
+        end_date: date = None,
+        emi_days: list = None,
+        member_ids: list = None,
+        group_ids: list = None,
+        staff_ids: list = None,
+        loan_ids: list = None,
+        sort_by: str = "loanId",
+        sort_order: str = "asc",
+        limit: int = 50,
+        after: str = None,
+        include_details: bool = False,
+    ):
+        """
+        Get one keyset page of the summary, user or collections section.
+        Rows are sorted in SQL (by loanId, pending, overdue or group) using loan_financials and only
+        the rows of the page are built. Totals for the whole filtered set come with the first page.
+        Raises ValueError for an invalid cursor, or one issued for another section or sort.
+        """
+        try:
+            # The cursor carries the row id to continue from, so ids keep counting across pages
+            start_id, key_cursor = 1, None
+            if after:
+                values = decode_cursor(after)
+                if len(values) != 2 or not isinstance(values[0], int) or not isinstance(values[1], str):
+                    raise ValueError("Invalid cursor")
+                start_id, key_cursor = values
+
+            loan_query = ReportsService._build_loan_query(
+                db,
+                start_date=start_date,
+                end_date=end_date,
+                emi_days=emi_days,
+                member_ids=member_ids,
+                group_ids=group_ids,
+                staff_ids=staff_ids,
+                loan_ids=loan_ids,
+            )
 
-                    if member_ids:
-                        loan_members = [m for m in loan_members if m.id in member_ids]
+            # User rows are per loan member, summary and collections rows are per loan
+            if section == "user":
+                base_query = loan_query.join(
+                    LoanMember, LoanMember.loan_id == Loan.id
+                ).with_entities(LoanMember, Loan)
+                financial_join = and_(
+                    LoanFinancial.loan_id == LoanMember.loan_id,
+                    LoanFinancial.member_id == LoanMember.member_id,
+                )
+                id_column = LoanMember.id
+            else:
+                base_query = loan_query
+                financial_join = and_(
+                    LoanFinancial.loan_id == Loan.id,
+                    LoanFinancial.member_id.is_(None),
+                )
+                id_column = Loan.id
 
-                    if loan_members:
-                        filtered_loans.append(loan)
+            base_query = base_query.outerjoin(
+                LoanFinancial, financial_join
+            ).outerjoin(
+                MemberGroup, MemberGroup.id == Loan.member_group_id
+            )
 
-                loans = filtered_loans if filtered_loans else []
+            emi_total = func.coalesce(LoanFinancial.emi_total, 0)
+            emi_paid = func.coalesce(LoanFinancial.emi_paid, 0)
+            emi_overdue = func.coalesce(LoanFinancial.emi_overdue, 0)
+            # Summary shows overdue separately from pending, the other sections include it
+            pending = emi_total - emi_paid - emi_overdue if section == "summary" else emi_total - emi_paid
+            sort_columns = {
+                "loanId": Loan.loan_id,
+                "pending": pending,
+                "overdue": emi_overdue,
+                "group": func.coalesce(MemberGroup.name, ""),
+            }
 
-            # Calculate metrics
-            metrics = ReportsService._calculate_metrics(db, loans)
+            items, next_key_cursor = paginate_keyset(
+                base_query,
+                [sort_columns[sort_by], id_column],
+                limit,
+                cursor=key_cursor,
+                descending=sort_order == "desc",
+                scope=f"{section}:{sort_by}:{sort_order}",
+            )
+            next_cursor = encode_cursor(start_id + len(items), next_key_cursor) if next_key_cursor else None
+
+            if section == "user":
+                page_loans = list({loan.id: loan for _, loan in items}.values())
+                context = ReportsService._build_report_context(db, page_loans, [section])
+                rows = list(ReportsService._iter_user_summary_rows(
+                    [(loan, member) for member, loan in items], context, start_id
+                ))
+            else:
+                context = ReportsService._build_report_context(db, items, [section], include_details)
+                if section == "summary":
+                    rows = list(ReportsService._iter_summary_rows(items, context, start_id))
+                else:
+                    rows = list(ReportsService._iter_collections_summary_rows(items, context, include_details, start_id))
+
+            page = {
+                "section": section,
+                "rows": rows,
+                "next_cursor": next_cursor,
+                "sort_by": sort_by,
+                "sort_order": sort_order,
+            }
 
-            # Get summary data
-            summary_data = ReportsService._get_summary_data(db, loans)
-            
-            # Get user summary data
-            user_summary_data = ReportsService._get_user_summary_data(db, loans)
-            
-            # Get EMI summary data
-            emi_summary_data = ReportsService._get_emi_summary_data(db, loans)
-            
-            # Get collections summary data
-            collections_summary_data = ReportsService._get_collections_summary_data(db, loans)
+            if not after:
+                page["totals"] = ReportsService._get_section_totals(
+                    base_query, section, id_column, emi_total, emi_paid, emi_overdue, pending
+                )
 
+            return page
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.exception(f"Error fetching {section} page: {str(e)}")
             return {
-                "metrics": metrics,
-                "summary_data": summary_data,
-                "user_summary_data": user_summary_data,
-                "emi_summary_data": emi_summary_data,
-                "collections_summary_data": collections_summary_data,
-                "loans_count": len(loans),
+                "section": section,
+                "rows": [],
+                "next_cursor": None,
+                "sort_by": sort_by,
+                "sort_order": sort_order,
             }
 
-        except Exception as e:
-            logger.exception(f"Error fetching reports data: {str(e)}")
+    @staticmethod
+    def _get_section_totals(base_query, section: str, id_column, emi_total, emi_paid, emi_overdue, pending):
+        """Sum the figures of a paged section over the whole filtered set in one statement"""
+        if section == "user":
+            count, total_emi, paid_emi, pending_emi = base_query.with_entities(
+                func.count(id_column),
+                func.sum(emi_total),
+                func.sum(emi_paid),
+                func.sum(pending),
+            ).one()
             return {
-                "metrics": {},
-                "summary_data": [],
-                "loans_count": 0,
+                "count": count,
+                "totalEmi": round(float(total_emi or 0), 2),
+                "paidEmi": round(float(paid_emi or 0), 2),
+                "pendingEmi": round(float(pending_emi or 0), 2),
             }
 
+        count, loan_amount, interest, collected, pending_amount, overdue = base_query.with_entities(
+            func.count(id_column),
+            func.sum(Loan.loan_amount * func.coalesce(LoanFinancial.member_count, 0)),
+            func.sum(func.coalesce(LoanFinancial.billed_interest, 0)),
+            func.sum(emi_paid),
+            func.sum(pending),
+            func.sum(emi_overdue),
+        ).one()
+        totals = {
+            "count": count,
+            "loanAmountValue": round(float(loan_amount or 0), 2),
+            "interestAmount": round(float(interest or 0), 2),
+            "collectedAmount": round(float(collected or 0), 2),
+            "pendingAmount": round(float(pending_amount or 0), 2),
+        }
+        if section == "summary":
+            totals["overdueAmount"] = round(float(overdue or 0), 2)
+        return totals
+
     @staticmethod
-    def _calculate_metrics(db: Session, loans: list):
+    def _compute_sections(db: Session, loan_query, sections: list, include_details: bool):
+        """
+        Compute the requested report sections for the filtered loans.
+        Returns the result and the ids of the loans it covers (None when the loans were not loaded).
+        """
+        result = {}
+
+        # Calculate metrics
+        if "metrics" in sections:
+            result["metrics"] = ReportsService._calculate_metrics(db, loan_query)
+
+        row_sections = [name for name in sections if name != "metrics"]
+        if not row_sections:
+            result["loans_count"] = result["metrics"].get("totalLoans", 0) if "metrics" in result else loan_query.count()
+            return result, None
+
+        loans = loan_query.all()
+
+        # Load members, groups, EMIs and billing once for the whole loan set
+        context = ReportsService._build_report_context(db, loans, row_sections, include_details)
+
+        # Get summary data
+        if "summary" in sections:
+            result["summary_data"] = ReportsService._get_summary_data(loans, context)
+        
+        # Get user summary data
+        if "user" in sections:
+            result["user_summary_data"] = ReportsService._get_user_summary_data(loans, context)
+        
+        # Get EMI summary data
+        if "emi" in sections:
+            result["emi_summary_data"] = ReportsService._get_emi_summary_data(loans, context, include_details)
+        
+        # Get collections summary data
+        if "collections" in sections:
+            result["collections_summary_data"] = ReportsService._get_collections_summary_data(
+                loans, context, include_details
+            )
+
+        result["loans_count"] = len(loans)
+        return result, [loan.id for loan in loans]
+
+    @staticmethod
+    def _compute_sections_parallel(sections: list, include_details: bool, **filters):
+        """
+        Compute each requested section on the section pool, every one with its own session.
+        Returns the merged result, with per-section timings under "metadata", and the ids of the loans it covers.
+        """
+        started = time.perf_counter()
+        futures = {
+            name: _section_executor.submit(ReportsService._compute_section_in_session, name, include_details, filters)
+            for name in sections
+        }
+
+        result = {}
+        loans_count = 0
+        result_loan_ids = None
+        section_timings = {}
+        for name, future in futures.items():
+            section_result, section_loan_ids, elapsed_ms = future.result()
+            loans_count = section_result.pop("loans_count", loans_count)
+            result.update(section_result)
+            section_timings[name] = elapsed_ms
+            if section_loan_ids is not None:
+                result_loan_ids = (result_loan_ids or set()) | set(section_loan_ids)
+
+        result["loans_count"] = loans_count
+        result["metadata"] = {
+            "parallel": True,
+            "section_timings_ms": section_timings,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return result, result_loan_ids
+
+    @staticmethod
+    def _compute_section_in_session(section: str, include_details: bool, filters: dict):
+        """Compute one report section on a new session; returns the section result, its loan ids and the time taken"""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            loan_query = ReportsService._build_loan_query(db, **filters)
+            result, loan_ids = ReportsService._compute_sections(db, loan_query, [section], include_details)
+        finally:
+            db.close()
+        return result, loan_ids, round((time.perf_counter() - started) * 1000, 1)
+
+    @staticmethod
+    def _build_report_context(db: Session, loans: list, sections: list, include_details: bool = False):
+        """Load members, groups and loan_financials for all loans with one query per table"""
+        context = {
+            "members_by_loan": {},
+            "groups_by_id": {},
+            "financials": {},
+            "emis_by_member": {},
+        }
+
+        loan_ids = [loan.id for loan in loans]
+        if not loan_ids:
+            return context
+
+        loan_members = db.query(LoanMember).filter(
+            LoanMember.loan_id.in_(loan_ids)
+        ).order_by(LoanMember.id).all()
+        for member in loan_members:
+            context["members_by_loan"].setdefault(member.loan_id, []).append(member)
+
+        group_ids = {loan.member_group_id for loan in loans if loan.member_group_id}
+        if group_ids and {"summary", "user", "collections"} & set(sections):
+            groups = db.query(MemberGroup).filter(MemberGroup.id.in_(group_ids)).all()
+            context["groups_by_id"] = {group.id: group for group in groups}
+
+        # Collected, pending, overdue and interest figures come from the loan_financials projection
+        context["financials"] = LoanFinancialService.get_financials(db, loan_ids)
+
+        # Individual EMI rows are only needed for the expanded detail arrays
+        if include_details and {"emi", "collections"} & set(sections):
+            emi_records = db.query(LoanMemberEmi).filter(
+                LoanMemberEmi.loan_id.in_(loan_ids)
+            ).order_by(LoanMemberEmi.id).all()
+            for emi in emi_records:
+                context["emis_by_member"].setdefault((emi.loan_id, emi.member_id), []).append(emi)
+
+        return context
+
+    @staticmethod
+    def _get_financial(context: dict, loan_id: int, member_id: int = None):
+        """Get the loan_financials row of a loan (member_id None) or one of its members"""
+        return context["financials"].get((loan_id, member_id)) or LoanFinancial()
+
+    @staticmethod
+    def _calculate_metrics(db: Session, loan_query):
         """Calculate metrics from billing table"""
         try:
-            loan_ids = [loan.id for loan in loans]
-            
-            if not loan_ids:
+            # Count loans, loan members and distinct member groups in one statement
+            total_loans, total_members, total_member_groups = loan_query.outerjoin(
+                LoanMember, LoanMember.loan_id == Loan.id
+            ).with_entities(
+                func.count(distinct(Loan.id)),
+                func.count(LoanMember.id),
+                func.count(distinct(LoanMember.member_group_id)),
+            ).one()
+
+            if not total_loans:
                 return {
                     "totalLoanAmount": 0,
                     "totalCollected": 0,
@@ -194,26 +719,17 @@ class ReportsService:
                     "totalMembers": 0,
                 }
 
-            # Get billing records for the loans
-            billing_records = db.query(Billing).filter(
-                Billing.loan_id.in_(loan_ids)
-            ).all()
+            # Sum billing amounts per billing_code for the selected loans
+            billing_totals = dict(
+                db.query(Billing.billing_code, func.sum(Billing.amount)).filter(
+                    Billing.loan_id.in_(loan_query.with_entities(Loan.id)),
+                    Billing.billing_code.in_(["LOAN_AMOUNT", "PAYMENT", "INTEREST"]),
+                ).group_by(Billing.billing_code).all()
+            )
 
-            # Calculate metrics based on billing_code
-            total_loan_amount = 0
-            total_collected = 0
-            total_interest_fees = 0
-            total_interest = 0
-
-            for billing in billing_records:
-                amount = float(billing.amount or 0)
-                
-                if billing.billing_code == "LOAN_AMOUNT":
-                    total_loan_amount += amount
-                elif billing.billing_code == "PAYMENT":
-                    total_collected += amount
-                elif billing.billing_code == "INTEREST":
-                    total_interest += amount
+            total_loan_amount = float(billing_totals.get("LOAN_AMOUNT") or 0)
+            total_collected = float(billing_totals.get("PAYMENT") or 0)
+            total_interest = float(billing_totals.get("INTEREST") or 0)
 
             # UI card label is "Total Interest + Fees", but requirement is:
             # show only total interest amount (exclude principal and all other fees)
@@ -222,28 +738,12 @@ class ReportsService:
             # Calculate pending amount
             total_pending = total_loan_amount - total_collected
 
-            # Count total members and unique member groups
-            total_members = 0
-            member_group_ids = set()
-            for loan in loans:
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-                total_members += len(loan_members)
-                
-                # Collect unique member group IDs
-                for member in loan_members:
-                    if member.member_group_id:
-                        member_group_ids.add(member.member_group_id)
-
-            total_member_groups = len(member_group_ids)
-
             return {
                 "totalLoanAmount": round(total_loan_amount, 2),
                 "totalCollected": round(total_collected, 2),
                 "totalPending": round(total_pending, 2),
                 "totalInterestFees": round(total_interest_fees, 2),
-                "totalLoans": len(loans),
+                "totalLoans": total_loans,
                 "totalMemberGroups": total_member_groups,
                 "totalMembers": total_members,
             }
@@ -252,321 +752,270 @@ class ReportsService:
             return {}
 
     @staticmethod
-    def _get_summary_data(db: Session, loans: list):
+    def _get_summary_data(loans: list, context: dict):
         """Get summary data for table"""
         try:
-            summary = []
-            for idx, loan in enumerate(loans, 1):
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-
-                member_names = ", ".join([m.name for m in loan_members])
-                member_count = len(loan_members)
-                
-                group = db.query(MemberGroup).filter(
-                    MemberGroup.id == loan.member_group_id
-                ).first()
-
-                # Calculate loan totals from EMI records
-                total_collected = 0
-                total_pending = 0
-                total_overdue = 0
-
-                emi_records = db.query(LoanMemberEmi).filter(
-                    LoanMemberEmi.loan_id == loan.id
-                ).all()
-
-                for emi in emi_records:
-                    if emi.emi_status == "PAID":
-                        total_collected += float(emi.emi_amount or 0)
-                    elif emi.emi_status == "OVERDUE":
-                        total_overdue += float(emi.emi_amount or 0)
-                    else:
-                        total_pending += float(emi.emi_amount or 0)
-
-                # Calculate total loan amount as loan_amount × number of members
-                base_loan_amount = float(loan.loan_amount or 0)
-                total_loan_amount = base_loan_amount * member_count
-
-                # Calculate total interest from billing table
-                total_interest = 0
-                try:
-                    interest_records = db.query(Billing).filter(
-                        Billing.loan_id == loan.id,
-                        Billing.billing_code.in_(['INTEREST'])
-                    ).all()
-
-                    for record in interest_records:
-                        total_interest += float(record.amount or 0)
-                except Exception as e:
-                    logger.warning(f"Error calculating interest for loan {loan.id}: {str(e)}")
-                    total_interest = 0
-
-                # Format loan amount with interest breakdown
-                loan_amount_display = f"{int(total_loan_amount)} + {int(total_interest)}" if total_interest > 0 else str(int(total_loan_amount))
-
-                summary.append(
-                    {
-                        "id": idx,
-                        "loanId": loan.loan_id,
-                        "groupName": group.name if group else "N/A",
-                        "members": member_names,
-                        "loanAmount": loan_amount_display,
-                        "loanAmountValue": total_loan_amount,
-                        "interestAmount": total_interest,
-                        "collectedAmount": total_collected,
-                        "pendingAmount": total_pending,
-                        "overdueAmount": total_overdue,
-                        "emiDay": loan.emi_day or "N/A",
-                        "status": loan.loan_status,
-                    }
-                )
-
-            return summary
+            return list(ReportsService._iter_summary_rows(loans, context))
         except Exception as e:
             logger.exception(f"Error getting summary data: {str(e)}")
             return []
 
     @staticmethod
-    def _get_user_summary_data(db: Session, loans: list):
+    def _iter_summary_rows(loans: list, context: dict, start_id: int = 1):
+        """Yield summary rows one loan at a time"""
+        for idx, loan in enumerate(loans, start_id):
+            loan_members = context["members_by_loan"].get(loan.id, [])
+
+            member_names = ", ".join([m.name for m in loan_members])
+            member_count = len(loan_members)
+            
+            group = context["groups_by_id"].get(loan.member_group_id)
+
+            # Loan totals from EMI records
+            financial = ReportsService._get_financial(context, loan.id)
+            total_collected = float(financial.emi_paid or 0)
+            total_overdue = float(financial.emi_overdue or 0)
+            total_pending = float(
+                (financial.emi_total or 0) - (financial.emi_paid or 0) - (financial.emi_overdue or 0)
+            )
+
+            # Calculate total loan amount as loan_amount × number of members
+            base_loan_amount = float(loan.loan_amount or 0)
+            total_loan_amount = base_loan_amount * member_count
+
+            # Total interest from billing table
+            total_interest = float(financial.billed_interest or 0)
+
+            # Format loan amount with interest breakdown
+            loan_amount_display = f"{int(total_loan_amount)} + {int(total_interest)}" if total_interest > 0 else str(int(total_loan_amount))
+
+            yield {
+                "id": idx,
+                "loanId": loan.loan_id,
+                "groupName": group.name if group else "N/A",
+                "members": member_names,
+                "loanAmount": loan_amount_display,
+                "loanAmountValue": total_loan_amount,
+                "interestAmount": total_interest,
+                "collectedAmount": total_collected,
+                "pendingAmount": total_pending,
+                "overdueAmount": total_overdue,
+                "emiDay": loan.emi_day or "N/A",
+                "status": loan.loan_status,
+            }
+
+    @staticmethod
+    def _get_user_summary_data(loans: list, context: dict):
         """Get user summary data with EMI details"""
+        return ReportsService._get_user_summary_rows(
+            ReportsService._loan_member_pairs(loans, context), context
+        )
+
+    @staticmethod
+    def _loan_member_pairs(loans: list, context: dict):
+        """Get (loan, loan member) pairs in loan order"""
+        return [
+            (loan, member)
+            for loan in loans
+            for member in context["members_by_loan"].get(loan.id, [])
+        ]
+
+    @staticmethod
+    def _get_user_summary_rows(loan_member_pairs: list, context: dict):
+        """Get user summary rows for the given (loan, loan member) pairs, in order"""
         try:
-            user_summary = []
-            user_id = 1
-            
-            for loan in loans:
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-                
-                group = db.query(MemberGroup).filter(
-                    MemberGroup.id == loan.member_group_id
-                ).first()
-                
-                for member in loan_members:
-                    # Get EMI records for this member
-                    emi_records = db.query(LoanMemberEmi).filter(
-                        LoanMemberEmi.loan_id == loan.id,
-                        LoanMemberEmi.member_id == member.member_id,
-                    ).all()
-                    
-                    total_emi = sum(float(emi.emi_amount or 0) for emi in emi_records)
-                    paid_emi = sum(
-                        float(emi.emi_amount or 0) for emi in emi_records 
-                        if (emi.emi_status or "").upper() == "PAID"
-                    )
-                    pending_emi = total_emi - paid_emi
-                    
-                    user_summary.append({
-                        "id": user_id,
-                        "userName": member.name,
-                        "loanId": loan.loan_id,
-                        "groupName": group.name if group else "N/A",
-                        "totalEmi": round(total_emi, 2),
-                        "paidEmi": round(paid_emi, 2),
-                        "pendingEmi": round(pending_emi, 2),
-                    })
-                    user_id += 1
-            
-            return user_summary
+            return list(ReportsService._iter_user_summary_rows(loan_member_pairs, context))
         except Exception as e:
             logger.exception(f"Error getting user summary data: {str(e)}")
             return []
 
     @staticmethod
-    def _get_emi_summary_data(db: Session, loans: list):
-        """Get EMI summary data with expandable EMI details"""
-        try:
-            emi_summary = []
-            emi_id = 1
+    def _iter_user_summary_rows(loan_member_pairs: list, context: dict, start_id: int = 1):
+        """Yield user summary rows one loan member at a time"""
+        for user_id, (loan, member) in enumerate(loan_member_pairs, start_id):
+            group = context["groups_by_id"].get(loan.member_group_id)
             
-            for loan in loans:
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-                
-                for member in loan_members:
-                    # Get EMI records for this loan
-                    emi_records = db.query(LoanMemberEmi).filter(
-                        LoanMemberEmi.loan_id == loan.id,
-                        LoanMemberEmi.member_id == member.member_id,
-                    ).all()
-                    
-                    total_emis = len(emi_records)
-                    paid_emis = len([e for e in emi_records if (e.emi_status or "").upper() == "PAID"])
-                    pending_emis = total_emis - paid_emis
-                    
-                    # Build EMI details for expansion
-                    emi_details = []
-                    for emi in emi_records:
-                        emi_details.append({
-                            "emiDate": emi.emi_date.strftime("%Y-%m-%d") if emi.emi_date else "N/A",
-                            "emiAmount": round(float(emi.emi_amount or 0), 2),
-                            "emiStatus": emi.emi_status,
-                        })
-                    
-                    emi_summary.append({
-                        "id": emi_id,
-                        "loanId": loan.loan_id,
-                        "userName": member.name,
-                        "totalEmis": total_emis,
-                        "paidEmis": paid_emis,
-                        "pendingEmis": pending_emis,
-                        "emiDetails": emi_details,
-                    })
-                    emi_id += 1
+            # EMI totals for this member
+            financial = ReportsService._get_financial(context, loan.id, member.member_id)
+            total_emi = float(financial.emi_total or 0)
+            paid_emi = float(financial.emi_paid or 0)
+            pending_emi = float((financial.emi_total or 0) - (financial.emi_paid or 0))
             
-            return emi_summary
+            yield {
+                "id": user_id,
+                "userName": member.name,
+                "loanId": loan.loan_id,
+                "groupName": group.name if group else "N/A",
+                "totalEmi": round(total_emi, 2),
+                "paidEmi": round(paid_emi, 2),
+                "pendingEmi": round(pending_emi, 2),
+            }
+
+    @staticmethod
+    def _get_emi_summary_data(loans: list, context: dict, include_details: bool = False):
+        """Get EMI summary data with expandable EMI details"""
+        try:
+            return list(ReportsService._iter_emi_summary_rows(loans, context, include_details))
         except Exception as e:
             logger.exception(f"Error getting EMI summary data: {str(e)}")
             return []
 
     @staticmethod
-    def _get_collections_summary_data(db: Session, loans: list):
-        """Get collections summary data with per-user breakdown"""
-        try:
-            collections_summary = []
-            collection_id = 1
+    def _iter_emi_summary_rows(loans: list, context: dict, include_details: bool = False, start_id: int = 1):
+        """Yield EMI summary rows one loan member at a time"""
+        loan_member_pairs = ReportsService._loan_member_pairs(loans, context)
+        for emi_id, (loan, member) in enumerate(loan_member_pairs, start_id):
+            # EMI counts for this member
+            financial = ReportsService._get_financial(context, loan.id, member.member_id)
+            total_emis = financial.emi_count or 0
+            paid_emis = financial.paid_emi_count or 0
+            pending_emis = total_emis - paid_emis
             
-            for loan in loans:
-                loan_members = db.query(LoanMember).filter(
-                    LoanMember.loan_id == loan.id
-                ).all()
-                member_count = len(loan_members)
-                
-                group = db.query(MemberGroup).filter(
-                    MemberGroup.id == loan.member_group_id
-                ).first()
-                
-                # Get EMI records for this loan
-                emi_records = db.query(LoanMemberEmi).filter(
-                    LoanMemberEmi.loan_id == loan.id
-                ).all()
-                
-                # Total principal across all members
-                base_loan_amount = float(loan.loan_amount or 0)
-                total_loan_amount = base_loan_amount * member_count
-
-                # Total interest from billing table (interest only)
-                total_interest = 0
-                try:
-                    interest_records = db.query(Billing).filter(
-                        Billing.loan_id == loan.id,
-                        Billing.billing_code.in_(['INTEREST'])
-                    ).all()
-                    for record in interest_records:
-                        total_interest += float(record.amount or 0)
-                except Exception as e:
-                    logger.warning(f"Error calculating interest for loan {loan.id}: {str(e)}")
-                    total_interest = 0
-
-                loan_amount_display = (
-                    f"{int(total_loan_amount)} + {int(total_interest)}"
-                    if total_interest > 0
-                    else str(int(total_loan_amount))
-                )
-                
-                # Calculate collected and pending from EMIs
-                total_collected = sum(
-                    float(emi.emi_amount or 0) for emi in emi_records 
-                    if emi.emi_status == "PAID"
-                )
-                total_pending = sum(
-                    float(emi.emi_amount or 0) for emi in emi_records 
-                    if emi.emi_status != "PAID"
-                )
-                
-                # Get next EMI details
-                next_emi = None
-                next_emi_date = "N/A"
-                next_emi_amount = 0
-                
-                pending_emis = [e for e in emi_records if e.emi_status != "PAID"]
-                if pending_emis:
-                    pending_emis.sort(key=lambda x: x.emi_date if x.emi_date else "")
-                    next_emi = pending_emis[0]
-                    next_emi_date = next_emi.emi_date.strftime("%Y-%m-%d") if next_emi.emi_date else "N/A"
-                    next_emi_amount = float(next_emi.emi_amount or 0)
-                
-                # Build user details for expansion
-                from datetime import datetime as dt
-                today = dt.now().date()
-                
-                user_details = []
-                for member in loan_members:
-                    member_emi_records = [
-                        emi for emi in emi_records
-                        if emi.member_id == member.member_id
-                    ]
-
-                    member_total_emi = sum(float(emi.emi_amount or 0) for emi in member_emi_records)
-                    member_paid_emi = sum(
-                        float(emi.emi_amount or 0) for emi in member_emi_records
-                        if (emi.emi_status or "").upper() == "PAID"
-                    )
-                    member_pending_emi = member_total_emi - member_paid_emi
-
-                    # Count EMI statuses
-                    total_emis = len(member_emi_records)
-                    paid_emis = len([e for e in member_emi_records if (e.emi_status or "").upper() == "PAID"])
-                    
-                    # No OD = count of EMIs with date < today
-                    overdue_emis = len([e for e in member_emi_records if e.emi_date and (e.emi_date.date() if hasattr(e.emi_date, 'date') else e.emi_date) < today])
-                    
-                    # OD Amt = sum of EMI amounts with date < today
-                    overdue_amount = sum(
-                        float(e.emi_amount or 0) for e in member_emi_records
-                        if e.emi_date and (e.emi_date.date() if hasattr(e.emi_date, 'date') else e.emi_date) < today
-                    )
+            emi_row = {
+                "id": emi_id,
+                "loanId": loan.loan_id,
+                "userName": member.name,
+                "totalEmis": total_emis,
+                "paidEmis": paid_emis,
+                "pendingEmis": pending_emis,
+            }
 
-                    # Member-level loan amount and collected/pending
-                    member_loan_amount = float(member.amount or 0)
-                    member_collected = float(member.collected or 0)
-                    member_advance = float(getattr(member, 'advance', 0) or 0)
-                    
-                    # LA = member loan amount + member's share of interest
-                    member_interest = total_interest / member_count if member_count > 0 else 0
-                    member_la = member_loan_amount + member_interest
-                    
-                    # Pending = member LA - paid amount
-                    member_pending = member_la - member_collected
-
-                    user_details.append({
-                        "userName": member.name,
-                        "mobileNumber": member.phone or "N/A",
-                        "loanAmount": round(member_la, 2),
-                        "collectedAmount": round(member_collected, 2),
-                        "pendingAmount": round(member_pending, 2),
-                        "loanAdvance": round(member_advance, 2),
-                        "totalEmis": total_emis,
-                        "paidEmis": paid_emis,
-                        "overdueEmis": overdue_emis,
-                        "totalOverdueAmount": round(overdue_amount, 2),
-                        "emiAmount": round(float(member_emi_records[0].emi_amount or 0), 2) if member_emi_records else 0,
-                        "totalEmi": round(member_total_emi, 2),
-                        "paidEmi": round(member_paid_emi, 2),
-                        "pendingEmi": round(member_pending_emi, 2),
-                    })
-                
-                collections_summary.append({
-                    "id": collection_id,
-                    "loanId": loan.loan_id,
-                    "groupName": group.name if group else "N/A",
-                    "emiDay": loan.emi_day or "N/A",
-                    "collectionDate": next_emi_date,
-                    "loanAmount": loan_amount_display,
-                    "loanAmountValue": round(total_loan_amount, 2),
-                    "interestAmount": round(total_interest, 2),
-                    "collectedAmount": round(total_collected, 2),
-                    "pendingAmount": round(total_pending, 2),
-                    "nextEmiDate": next_emi_date,
-                    "nextEmiAmount": round(next_emi_amount, 2),
-                    "userDetails": user_details,
-                })
-                collection_id += 1
+            # Build EMI details for expansion
+            if include_details:
+                emi_records = context["emis_by_member"].get((loan.id, member.member_id), [])
+                emi_row["emiDetails"] = [
+                    {
+                        "emiDate": emi.emi_date.strftime("%Y-%m-%d") if emi.emi_date else "N/A",
+                        "emiAmount": round(float(emi.emi_amount or 0), 2),
+                        "emiStatus": emi.emi_status,
+                    }
+                    for emi in emi_records
+                ]
             
-            return collections_summary
+            yield emi_row
+
+    @staticmethod
+    def _get_collections_summary_data(loans: list, context: dict, include_details: bool = False):
+        """Get collections summary data with per-user breakdown"""
+        try:
+            return list(ReportsService._iter_collections_summary_rows(loans, context, include_details))
         except Exception as e:
             logger.exception(f"Error getting collections summary data: {str(e)}")
             return []
+
+    @staticmethod
+    def _iter_collections_summary_rows(loans: list, context: dict, include_details: bool = False, start_id: int = 1):
+        """Yield collections summary rows one loan at a time"""
+        today = datetime.now().date()
+        
+        for collection_id, loan in enumerate(loans, start_id):
+            loan_members = context["members_by_loan"].get(loan.id, [])
+            member_count = len(loan_members)
+            
+            group = context["groups_by_id"].get(loan.member_group_id)
+            
+            financial = ReportsService._get_financial(context, loan.id)
+            
+            # Total principal across all members
+            base_loan_amount = float(loan.loan_amount or 0)
+            total_loan_amount = base_loan_amount * member_count
+
+            # Total interest from billing table (interest only)
+            total_interest = float(financial.billed_interest or 0)
+
+            loan_amount_display = (
+                f"{int(total_loan_amount)} + {int(total_interest)}"
+                if total_interest > 0
+                else str(int(total_loan_amount))
+            )
+            
+            # Collected and pending from EMIs
+            total_collected = float(financial.emi_paid or 0)
+            total_pending = float((financial.emi_total or 0) - (financial.emi_paid or 0))
+            
+            # Next EMI details
+            next_emi_date = financial.next_emi_date.strftime("%Y-%m-%d") if financial.next_emi_date else "N/A"
+            next_emi_amount = float(financial.next_emi_amount or 0) if financial.next_emi_date else 0
+            
+            collection_row = {
+                "id": collection_id,
+                "loanId": loan.loan_id,
+                "groupName": group.name if group else "N/A",
+                "emiDay": loan.emi_day or "N/A",
+                "collectionDate": next_emi_date,
+                "loanAmount": loan_amount_display,
+                "loanAmountValue": round(total_loan_amount, 2),
+                "interestAmount": round(total_interest, 2),
+                "collectedAmount": round(total_collected, 2),
+                "pendingAmount": round(total_pending, 2),
+                "nextEmiDate": next_emi_date,
+                "nextEmiAmount": round(next_emi_amount, 2),
+            }
+
+            # Build user details for expansion
+            if include_details:
+                collection_row["userDetails"] = ReportsService._get_collection_user_details(
+                    loan, loan_members, context, total_interest, today
+                )
+
+            yield collection_row
+
+    @staticmethod
+    def _get_collection_user_details(loan, loan_members: list, context: dict, total_interest: float, today: date):
+        """Get the per-user breakdown shown when a collections summary row is expanded"""
+        member_count = len(loan_members)
+        user_details = []
+
+        for member in loan_members:
+            member_emi_records = context["emis_by_member"].get((loan.id, member.member_id), [])
+
+            member_total_emi = sum(float(emi.emi_amount or 0) for emi in member_emi_records)
+            member_paid_emi = sum(
+                float(emi.emi_amount or 0) for emi in member_emi_records
+                if (emi.emi_status or "").upper() == "PAID"
+            )
+            member_pending_emi = member_total_emi - member_paid_emi
+
+            # Count EMI statuses
+            total_emis = len(member_emi_records)
+            paid_emis = len([e for e in member_emi_records if (e.emi_status or "").upper() == "PAID"])
+
+            # No OD = count of EMIs with date < today
+            overdue_emis = len([e for e in member_emi_records if e.emi_date and (e.emi_date.date() if hasattr(e.emi_date, 'date') else e.emi_date) < today])
+
+            # OD Amt = sum of EMI amounts with date < today
+            overdue_amount = sum(
+                float(e.emi_amount or 0) for e in member_emi_records
+                if e.emi_date and (e.emi_date.date() if hasattr(e.emi_date, 'date') else e.emi_date) < today
+            )
+
+            # Member-level loan amount and collected/pending
+            member_loan_amount = float(member.amount or 0)
+            member_collected = float(member.collected or 0)
+            member_advance = float(getattr(member, 'advance', 0) or 0)
+
+            # LA = member loan amount + member's share of interest
+            member_interest = total_interest / member_count if member_count > 0 else 0
+            member_la = member_loan_amount + member_interest
+
+            # Pending = member LA - paid amount
+            member_pending = member_la - member_collected
+
+            user_details.append({
+                "userName": member.name,
+                "mobileNumber": member.phone or "N/A",
+                "loanAmount": round(member_la, 2),
+                "collectedAmount": round(member_collected, 2),
+                "pendingAmount": round(member_pending, 2),
+                "loanAdvance": round(member_advance, 2),
+                "totalEmis": total_emis,
+                "paidEmis": paid_emis,
+                "overdueEmis": overdue_emis,
+                "totalOverdueAmount": round(overdue_amount, 2),
+                "emiAmount": round(float(member_emi_records[0].emi_amount or 0), 2) if member_emi_records else 0,
+                "totalEmi": round(member_total_emi, 2),
+                "paidEmi": round(member_paid_emi, 2),
+                "pendingEmi": round(member_pending_emi, 2),
+            })
+
+        return user_details
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from models.staff import Staff
 from schemas.staff_schema import StaffCreate, StaffUpdate
+from services.report_cache import filter_options_cache
+from services.pagination import paginate_keyset
 from datetime import datetime
 
 
@@ -50,11 +52,19 @@ class StaffService:
         return db.query(Staff).filter(Staff.id == staff_id, Staff.del_mark == 'N').first()
 
     @staticmethod
-    def get_all_staff(db: Session, skip: int = 0, limit: int = 100) -> list:
-        """Get all active staff members"""
-        return db.query(Staff).filter(
-            Staff.del_mark == 'N'
-        ).order_by(Staff.id.desc()).offset(skip).limit(limit).all()
+    def get_all_staff(db: Session, skip: int = 0, limit: int = 100, after: str = None) -> tuple:
+        """
+        Get one page of active staff members, newest first.
+        Returns the staff and the cursor of the next page; pass it as after to continue.
+        """
+        return paginate_keyset(
+            db.query(Staff).filter(Staff.del_mark == 'N'),
+            [Staff.id],
+            limit,
+            cursor=after,
+            descending=True,
+            offset=skip,
+        )
 
     @staticmethod
     def get_staff_by_email(db: Session, email: str) -> Staff:
@@ -123,6 +133,7 @@ class StaffService:
         db.add(db_staff)
         db.commit()
         db.refresh(db_staff)
+        filter_options_cache.clear()
         return db_staff
 
     @staticmethod
@@ -140,6 +151,7 @@ class StaffService:
         db.add(db_staff)
         db.commit()
         db.refresh(db_staff)
+        filter_options_cache.clear()
         return db_staff
 
     @staticmethod
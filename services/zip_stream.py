@@ -0,0 +1,38 @@
+import zipfile
+
+
+class ChunkSink:
+    """Write-only file object that collects zip output until it is drained; has no tell() so zipfile streams"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries):
+    """
+    Yield a ZIP archive as bytes chunks. entries yields (name, chunks) pairs, where chunks is an
+    iterable of the entry's bytes; each entry is compressed and sent on as its chunks are produced.
+    """
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, chunks in entries:
+            with zf.open(name, "w") as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()